@@ -1,75 +1,141 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import sys
-from datetime import datetime
 from dotenv import load_dotenv
 
 # Add database directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'database'))
-from db_config import get_db_connection, dict_from_row, DB_TYPE
+from db_config import db_connection, DB_TYPE
+from cache import catalog_cache, order_cache
+from catalog import execute_product_listing
+from queries import execute
+from rows import stream_cursor, stream_json
+from newsletter import newsletter_writer
+import metrics
+import handlers
+from handlers import RequestError, order_workers
+from build_assets import static_assets
 
 # Load environment variables
 load_dotenv()
 
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that records serialization time in the request metrics"""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
 app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend requests
+app.json = TimedJSONProvider(app)
+CORS(app, expose_headers=['X-Next-Cursor'])  # Enable CORS for frontend requests
+
+# Queued order intake (ORDER_INTAKE_MODE=queued)
+if order_workers:
+    order_workers.start()
+
+# ============= REQUEST METRICS =============
+
+@app.before_request
+def start_request_metrics():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.request_metrics = metrics.start_request(request.method, route)
+
+@app.after_request
+def record_response_status(response):
+    if 'request_metrics' in g:
+        g.request_metrics.status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Runs after the last chunk of a streamed response, so streaming time is included
+    if 'request_metrics' in g:
+        metrics.finish_request(g.pop('request_metrics'), status=500 if error else None)
+
+handlers.register_gauges()
+
+@app.errorhandler(RequestError)
+def request_error(e):
+    return jsonify(e.body), e.status
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, query, pool and cache metrics in Prometheus text format"""
+    return app.response_class(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# ============= CATALOG RESPONSES =============
+
+def catalog_response(key, loader, encoder=handlers.encode_catalog):
+    """
+    Serve a pre-encoded catalog response from the cache
+    Returns None when loader() finds nothing.
+    """
+    handlers.sync_catalog_version()
+    entry = catalog_cache.get_or_load(key, lambda: encoder(loader()))
+    if entry is None:
+        return None
+    
+    body, status, headers = handlers.catalog_reply(entry, request.headers.get('If-None-Match', ''))
+    return app.response_class(body, status=status, headers=headers)
+
+def stream_response(run, skip_last=0):
+    """
+    Stream a query's rows as a JSON array without holding the result in memory
+    run(cursor) executes the query. The pooled connection is held until the
+    last batch is sent or the client disconnects. Responses are not cached.
+    """
+    def generate():
+        with db_connection(readonly=True) as conn:
+            cursor = stream_cursor(conn)
+            run(cursor)
+            chunks = stream_json(cursor, skip_last=skip_last, default=app.json.default)
+            first = next(chunks)
+            yield None  # Primed: the query ran before the response started
+            yield first
+            yield from chunks
+            yield '\n'
+    
+    # Run the query now so database errors still produce a 500
+    chunks = generate()
+    next(chunks)
+    return app.response_class(stream_with_context(chunks), mimetype='application/json')
 
 # ============= PRODUCT ENDPOINTS =============
 
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    """Get all active products with optional category filter"""
-    category = request.args.get('category')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Use appropriate placeholder for database type
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
-    
-    if category and category != 'all':
-        cursor.execute(f'''
-            SELECT p.*, c.name as category_name, c.slug as category_slug
-            FROM products p
-            JOIN categories c ON p.category_id = c.id
-            WHERE p.is_active = TRUE AND c.slug = {placeholder}
-            ORDER BY p.featured DESC, p.name ASC
-        ''', (category,))
-    else:
-        cursor.execute('''
-            SELECT p.*, c.name as category_name, c.slug as category_slug
-            FROM products p
-            JOIN categories c ON p.category_id = c.id
-            WHERE p.is_active = TRUE
-            ORDER BY p.featured DESC, p.name ASC
-        ''')
-    
-    products = [dict_from_row(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify(products)
+    """
+    Get active products with optional category filter
+    The next page's cursor is returned in the X-Next-Cursor header.
+    """
+    category, stream, after, limit, fields = handlers.product_query(request.args)
+    if stream:
+        return stream_response(lambda cursor: execute_product_listing(cursor, category, fields), skip_last=3)
+    
+    return catalog_response(
+        ('products', category, after, limit, fields),
+        lambda: handlers.load_products(category, after, limit, fields),
+        encoder=handlers.encode_page
+    )
+
+@app.route('/api/products/search', methods=['GET'])
+def search_products():
+    """Ranked full-text search over products and jerky products (?q=&limit=)"""
+    query, limit = handlers.search_query(request.args)
+    return catalog_response(('search', query.lower(), limit),
+                            lambda: handlers.load_search_results(query, limit))
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     """Get a single product by ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
-    
-    cursor.execute(f'''
-        SELECT p.*, c.name as category_name, c.slug as category_slug
-        FROM products p
-        JOIN categories c ON p.category_id = c.id
-        WHERE p.id = {placeholder} AND p.is_active = TRUE
-    ''', (product_id,))
+    response = catalog_response(('product', product_id), lambda: handlers.load_product(product_id))
     
-    product = cursor.fetchone()
-    conn.close()
-    
-    if product:
-        return jsonify(dict_from_row(product))
+    if response:
+        return response
     else:
         return jsonify({'error': 'Product not found'}), 404
 
@@ -78,56 +144,25 @@ def get_product(product_id):
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Get all categories"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM categories
-        ORDER BY display_order ASC
-    ''')
-    
-    categories = [dict_from_row(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify(categories)
+    return catalog_response(('categories',), handlers.load_categories)
 
 # ============= JERKY PRODUCTS ENDPOINTS =============
 
 @app.route('/api/jerky-products', methods=['GET'])
 def get_jerky_products():
-    """Get all active jerky products"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM jerky_products
-        WHERE is_active = TRUE
-        ORDER BY display_order ASC
-    ''')
-    
-    jerky_products = [dict_from_row(row) for row in cursor.fetchall()]
-    conn.close()
+    """Get all active jerky products (?stream=1 streams them)"""
+    if handlers.wants_stream(request.args):
+        return stream_response(lambda cursor: execute(cursor, 'jerky_products'))
     
-    return jsonify(jerky_products)
+    return catalog_response(('jerky_products',), handlers.load_jerky_products)
 
 @app.route('/api/jerky-products/<int:jerky_id>', methods=['GET'])
 def get_jerky_product(jerky_id):
     """Get a single jerky product by ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    response = catalog_response(('jerky_product', jerky_id), lambda: handlers.load_jerky_product(jerky_id))
     
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
-    
-    cursor.execute(f'''
-        SELECT * FROM jerky_products
-        WHERE id = {placeholder} AND is_active = TRUE
-    ''', (jerky_id,))
-    
-    jerky_product = cursor.fetchone()
-    conn.close()
-    
-    if jerky_product:
-        return jsonify(dict_from_row(jerky_product))
+    if response:
+        return response
     else:
         return jsonify({'error': 'Jerky product not found'}), 404
 
@@ -136,234 +171,83 @@ def get_jerky_product(jerky_id):
 @app.route('/api/orders', methods=['POST'])
 def create_order():
     """Create a new order"""
-    data = request.json
-    
-    # Validate required fields
-    required_fields = ['customer_email', 'items', 'shipping_address']
-    if not all(field in data for field in required_fields):
-        return jsonify({'error': 'Missing required fields'}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
-    
-    try:
-        # Create or get customer
-        if DB_TYPE == 'postgresql':
-            cursor.execute(f'''
-                INSERT INTO customers (email, first_name, last_name, phone)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder})
-                ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
-                RETURNING id
-            ''', (
-                data['customer_email'],
-                data.get('first_name', ''),
-                data.get('last_name', ''),
-                data.get('phone', '')
-            ))
-            customer_id = cursor.fetchone()['id']
-        else:
-            cursor.execute(f'''
-                INSERT OR IGNORE INTO customers (email, first_name, last_name, phone)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder})
-            ''', (
-                data['customer_email'],
-                data.get('first_name', ''),
-                data.get('last_name', ''),
-                data.get('phone', '')
-            ))
-            cursor.execute(f'SELECT id FROM customers WHERE email = {placeholder}', (data['customer_email'],))
-            customer_id = cursor.fetchone()['id']
-        
-        # Create shipping address
-        shipping = data['shipping_address']
-        if DB_TYPE == 'postgresql':
-            cursor.execute(f'''
-                INSERT INTO addresses 
-                (customer_id, address_type, street_address, street_address_2, city, state, postal_code, country)
-                VALUES ({placeholder}, 'shipping', {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-                RETURNING id
-            ''', (
-                customer_id,
-                shipping['street_address'],
-                shipping.get('street_address_2', ''),
-                shipping['city'],
-                shipping['state'],
-                shipping['postal_code'],
-                shipping.get('country', 'USA')
-            ))
-            shipping_address_id = cursor.fetchone()['id']
-        else:
-            cursor.execute(f'''
-                INSERT INTO addresses 
-                (customer_id, address_type, street_address, street_address_2, city, state, postal_code, country)
-                VALUES ({placeholder}, 'shipping', {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            ''', (
-                customer_id,
-                shipping['street_address'],
-                shipping.get('street_address_2', ''),
-                shipping['city'],
-                shipping['state'],
-                shipping['postal_code'],
-                shipping.get('country', 'USA')
-            ))
-            shipping_address_id = cursor.lastrowid
-        
-        # Calculate totals
-        subtotal = sum(item['price'] * item['quantity'] for item in data['items'])
-        tax = subtotal * 0.0775  # 7.75% CA tax
-        shipping_cost = 0.00 if subtotal > 50 else 5.99
-        total = subtotal + tax + shipping_cost
-        
-        # Generate order number
-        order_number = f"TBJ-{datetime.now().strftime('%Y%m%d')}-{customer_id:04d}"
-        
-        # Create order
-        if DB_TYPE == 'postgresql':
-            cursor.execute(f'''
-                INSERT INTO orders 
-                (order_number, customer_id, shipping_address_id, subtotal, tax, shipping_cost, total, status, payment_status)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, 'pending', 'pending')
-                RETURNING id
-            ''', (order_number, customer_id, shipping_address_id, subtotal, tax, shipping_cost, total))
-            order_id = cursor.fetchone()['id']
-        else:
-            cursor.execute(f'''
-                INSERT INTO orders 
-                (order_number, customer_id, shipping_address_id, subtotal, tax, shipping_cost, total, status, payment_status)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, 'pending', 'pending')
-            ''', (order_number, customer_id, shipping_address_id, subtotal, tax, shipping_cost, total))
-            order_id = cursor.lastrowid
-        
-        # Create order items and update inventory
-        for item in data['items']:
-            cursor.execute(f'''
-                INSERT INTO order_items (order_id, product_id, product_name, quantity, unit_price, subtotal)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            ''', (
-                order_id,
-                item['id'],
-                item['name'],
-                item['quantity'],
-                item['price'],
-                item['price'] * item['quantity']
-            ))
-            
-            cursor.execute(f'''
-                UPDATE products SET stock_quantity = stock_quantity - {placeholder}
-                WHERE id = {placeholder}
-            ''', (item['quantity'], item['id']))
-            
-            cursor.execute(f'''
-                INSERT INTO inventory_transactions (product_id, transaction_type, quantity_change, reference_id)
-                VALUES ({placeholder}, 'sale', {placeholder}, {placeholder})
-            ''', (item['id'], -item['quantity'], order_id))
-        
-        conn.commit()
-        
-        # Fetch the created order
-        cursor.execute(f'''
-            SELECT * FROM orders WHERE id = {placeholder}
-        ''', (order_id,))
-        order = dict_from_row(cursor.fetchone())
-        
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'order': order,
-            'message': 'Order created successfully'
-        }), 201
-        
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({'error': str(e)}), 500
+    handlers.sync_catalog_version()
+    body, status, headers = handlers.create_order(request.get_json(silent=True))
+    return jsonify(body), status, headers or {}
 
 @app.route('/api/orders/<order_number>', methods=['GET'])
 def get_order(order_number):
     """Get order details by order number"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
-    
-    cursor.execute(f'''
-        SELECT o.*, c.email, c.first_name, c.last_name
-        FROM orders o
-        JOIN customers c ON o.customer_id = c.id
-        WHERE o.order_number = {placeholder}
-    ''', (order_number,))
-    
-    order = cursor.fetchone()
-    
-    if not order:
-        conn.close()
-        return jsonify({'error': 'Order not found'}), 404
-    
-    order_dict = dict_from_row(order)
-    
-    cursor.execute(f'''
-        SELECT * FROM order_items WHERE order_id = {placeholder}
-    ''', (order_dict['id'],))
+    queued = handlers.queued_order(order_number)
+    if queued:
+        return jsonify(queued)
     
-    order_dict['items'] = [dict_from_row(row) for row in cursor.fetchall()]
-    
-    conn.close()
-    
-    return jsonify(order_dict)
+    order = order_cache.get_or_load(order_number, lambda: handlers.load_order(order_number))
+    body, status = handlers.order_lookup(order)
+    return jsonify(body), status
 
 # ============= NEWSLETTER ENDPOINT =============
 
 @app.route('/api/newsletter/subscribe', methods=['POST'])
 def subscribe_newsletter():
     """Subscribe to newsletter"""
-    data = request.json
-    email = data.get('email')
-    
-    if not email:
-        return jsonify({'error': 'Email is required'}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
+    email = handlers.newsletter_email(request.get_json(silent=True))
     
     try:
-        if DB_TYPE == 'postgresql':
-            cursor.execute(f'''
-                INSERT INTO newsletter_subscribers (email)
-                VALUES ({placeholder})
-                ON CONFLICT (email) DO NOTHING
-            ''', (email,))
-        else:
-            cursor.execute(f'''
-                INSERT OR IGNORE INTO newsletter_subscribers (email)
-                VALUES ({placeholder})
-            ''', (email,))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Successfully subscribed to newsletter'
-        }), 201
+        # Waits until the batch holding this email is committed
+        subscribed = newsletter_writer.subscribe(email).result()
     except Exception as e:
-        conn.close()
         return jsonify({'error': str(e)}), 500
+    
+    body, status = handlers.newsletter_reply(subscribed)
+    return jsonify(body), status
+
+# ============= STATS ENDPOINTS =============
+
+@app.route('/api/stats/daily-sales', methods=['GET'])
+def get_daily_sales():
+    """Units and revenue per day for the last ?days= days (default 30)"""
+    return jsonify(handlers.load_stats('stats_daily_sales', handlers.daily_sales_query(request.args)))
+
+@app.route('/api/stats/best-sellers', methods=['GET'])
+def get_best_sellers():
+    """Top products by units sold over the last ?days= days (?limit=, default 10)"""
+    return jsonify(handlers.load_stats('stats_best_sellers', handlers.best_sellers_query(request.args)))
+
+@app.route('/api/stats/stock-movement', methods=['GET'])
+def get_stock_movement():
+    """Units in and out of stock per product, summed from the inventory ledger"""
+    return jsonify(handlers.load_stats('stats_stock_movement'))
 
 # ============= HEALTH CHECK =============
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'database': DB_TYPE,
-        'timestamp': datetime.now().isoformat()
-    })
+    return jsonify(handlers.health())
+
+# ============= STATIC ASSETS =============
+
+@app.route('/', methods=['GET'])
+def index_page():
+    """index.html from the asset build (python build_assets.py)"""
+    return static_file('index.html')
+
+@app.route('/<path:filename>', methods=['GET'])
+def static_file(filename):
+    """Built assets in the smallest encoding the client accepts"""
+    resolved = static_assets.resolve(filename, request.headers.get('Accept-Encoding', ''))
+    if resolved is None:
+        return jsonify({'error': 'Not found'}), 404
+    
+    path, content_type, encoding, cache_control = resolved
+    response = send_file(path, conditional=True)
+    response.headers['Content-Type'] = content_type
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
 
 if __name__ == '__main__':
     print(f"🚀 Starting API server with {DB_TYPE.upper()} database...")
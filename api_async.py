@@ -0,0 +1,494 @@
+"""
+Asyncio entry point serving the same API as api.py
+
+Usage:
+    python api_async.py [--host 127.0.0.1] [--port 5000]
+
+Runs on aiohttp. On PostgreSQL, catalog, order lookup and stats queries go
+through an asyncpg pool and never block the event loop. SQLite has no async
+driver, so its calls run in a bounded thread pool (ASYNC_DB_THREADS) over
+the regular connection pool. Order placement keeps its synchronous
+transaction (stock locks, retries) on both backends and runs in the same
+thread pool; newsletter signups await the shared batched writer.
+Validation, response bodies, ETags and order handling come from
+database/handlers.py, shared with api.py; this module only adapts them to
+aiohttp and does the non-blocking reads.
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import asyncpg
+from aiohttp import web
+from dotenv import load_dotenv
+
+# Add database directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'database'))
+from db_config import db_connection, DB_TYPE, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+from cache import catalog_cache, order_cache
+from catalog import product_page_text, product_page_params, finish_product_page
+from queries import COMPILED, DB_PREPARE_STATEMENTS, compile_sql, compile_native_sql, execute
+from rows import RowShape, tuple_cursor, stream_cursor, stream_json, STREAM_BATCH_SIZE
+from search import search_params
+from orders import order_from_row
+from newsletter import newsletter_writer
+import metrics
+import handlers
+from handlers import RequestError, json_default, order_workers
+from build_assets import static_assets
+
+# Load environment variables
+load_dotenv()
+
+# Threads running blocking database work; beyond this, requests queue without holding a thread
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', str(DB_POOL_MAX_SIZE)))
+
+executor = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix='db')
+pg_pool = None  # asyncpg pool, opened on startup when DB_TYPE is postgresql
+
+def json_response(data, status=200, headers=None):
+    """Compact JSON with a trailing newline, like flask.jsonify"""
+    with metrics.timed('serialize'):
+        body = json.dumps(data, default=json_default, sort_keys=True, separators=(',', ':'))
+    return web.Response(text=body + '\n', status=status, content_type='application/json', headers=headers)
+
+def reply(result):
+    """json_response for a (body, status[, headers]) tuple from handlers"""
+    return json_response(*result)
+
+async def run_blocking(fn, *args):
+    """Run blocking database code in the bounded executor, keeping the request's metrics context"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, fn, *args))
+
+# ============= DATABASE ACCESS =============
+
+async def open_pg_pool(app):
+    global pg_pool
+    if DB_TYPE != 'postgresql':
+        return
+    pg_pool = await asyncpg.create_pool(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=int(os.getenv('POSTGRES_PORT', '5433')),
+        database=os.getenv('POSTGRES_DB', 'tahoe_bear_jerky'),
+        user=os.getenv('POSTGRES_USER', 'postgres'),
+        password=os.getenv('POSTGRES_PASSWORD', ''),
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        # asyncpg prepares every query; PgBouncer transaction pooling needs that off
+        statement_cache_size=100 if DB_PREPARE_STATEMENTS else 0,
+    )
+
+async def close_pg_pool(app):
+    if pg_pool is not None:
+        await pg_pool.close()
+
+async def acquire_pg():
+    start = time.perf_counter()
+    conn = await pg_pool.acquire()
+    metrics.record_acquire('asyncpg', time.perf_counter() - start)
+    return conn
+
+async def fetch_rows(name, params=(), text=None):
+    """
+    (column names, rows) of a named query, or of ad-hoc SQL text with ? placeholders
+    Rows are tuples on SQLite and asyncpg Records on PostgreSQL; both work with RowShape.
+    """
+    if pg_pool is None:
+        return await run_blocking(fetch_rows_blocking, name, params, text)
+
+    sql = compile_native_sql(text) if text else COMPILED[name].native_sql
+    conn = await acquire_pg()
+    try:
+        with metrics.query(name):
+            rows = await conn.fetch(sql, *params)
+            metrics.record_rows(len(rows))
+    finally:
+        await pg_pool.release(conn)
+    return (list(rows[0].keys()) if rows else []), rows
+
+def fetch_rows_blocking(name, params, text):
+    with db_connection(readonly=True) as conn:
+        cursor = tuple_cursor(conn)
+        if text:
+            with metrics.query(name):
+                cursor.execute(compile_sql(text), params)
+        else:
+            execute(cursor, name, params)
+        rows = metrics.timed_fetch(cursor.fetchall)
+        return [column[0] for column in cursor.description], rows
+
+async def fetch_dicts(name, params=()):
+    columns, rows = await fetch_rows(name, params)
+    return RowShape(columns, sort_keys=False).dicts(rows)
+
+async def fetch_one_dict(name, params=()):
+    rows = await fetch_dicts(name, params)
+    return rows[0] if rows else None
+
+async def fetch_json(name, params=()):
+    columns, rows = await fetch_rows(name, params)
+    return RowShape(columns, default=json_default).json_array(rows)
+
+# ============= REQUEST HANDLING =============
+
+@web.middleware
+async def record_request_metrics(request, handler):
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else 'unmatched'
+    request_metrics = metrics.start_request(request.method, route)
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        # Streamed responses are written inside the handler, so streaming time is included
+        metrics.finish_request(request_metrics, status)
+
+@web.middleware
+async def request_errors(request, handler):
+    """Render handlers.RequestError as api.py's error handler does"""
+    try:
+        return await handler(request)
+    except RequestError as e:
+        return json_response(e.body, e.status)
+
+@web.middleware
+async def cors(request, handler):
+    """Allow any origin, as flask-cors does for api.py"""
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        response = web.Response(headers={
+            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+            'Access-Control-Allow-Headers': request.headers.get('Access-Control-Request-Headers', ''),
+        })
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+    return response
+
+async def read_json(request):
+    """The JSON body, or None if it is missing or malformed (like Flask's get_json(silent=True))"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+# ============= CATALOG RESPONSES =============
+
+async def catalog_response(request, key, loader, encoder=handlers.encode_catalog):
+    """
+    api.py's catalog_response for a coroutine function loader
+    Returns None when loader() finds nothing.
+    """
+    await sync_catalog_version()
+
+    async def load():
+        return encoder(await loader())
+
+    entry = await catalog_cache.get_or_load_async(key, load)
+    if entry is None:
+        return None
+
+    body, status, headers = handlers.catalog_reply(entry, request.headers.get('If-None-Match', ''))
+    return web.Response(body=body, status=status, headers=headers)
+
+async def load_catalog_version():
+    """Read the persisted catalog version bumped by bulk imports"""
+    row = await fetch_one_dict('catalog_version')
+    return row['version'] if row else None
+
+async def sync_catalog_version():
+    """Drop cached catalog data and prices if another process imported a catalog"""
+    if not catalog_cache.poll_due():
+        return
+    try:
+        catalog_cache.observe_version(await load_catalog_version())
+    except Exception as e:
+        handlers.catalog_version_unavailable(e)
+
+async def stream_response(request, name, params=(), text=None, skip_last=0):
+    """
+    Stream a query's rows as a JSON array without holding the result in memory
+    On PostgreSQL rows come from an asyncpg cursor in batches; on SQLite the
+    blocking generator from rows.stream_json is stepped in the executor.
+    """
+    response = web.StreamResponse(headers={'Content-Type': 'application/json'})
+    if pg_pool is None:
+        chunks = await run_blocking(open_sqlite_stream, name, text, params, skip_last)
+        try:
+            await response.prepare(request)
+            while True:
+                chunk = await run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                await response.write(chunk.encode('utf-8'))
+        finally:
+            await run_blocking(chunks.close)
+        await response.write_eof()
+        return response
+
+    sql = compile_native_sql(text) if text else COMPILED[name].native_sql
+    conn = await acquire_pg()
+    try:
+        async with conn.transaction():
+            with metrics.query(name):
+                cursor = await conn.cursor(sql, *params)
+                rows = await cursor.fetch(STREAM_BATCH_SIZE)
+            columns = list(rows[0].keys()) if rows else []
+            shape = RowShape(columns[:len(columns) - skip_last], default=json_default)
+            await response.prepare(request)
+            separator = '['
+            while rows:
+                metrics.record_rows(len(rows))
+                await response.write((separator + ','.join(shape.encode_rows(rows))).encode('utf-8'))
+                separator = ','
+                rows = await cursor.fetch(STREAM_BATCH_SIZE)
+            await response.write(('[]' if separator == '[' else ']').encode('utf-8') + b'\n')
+    finally:
+        await pg_pool.release(conn)
+    await response.write_eof()
+    return response
+
+def open_sqlite_stream(name, text, params, skip_last):
+    """Blocking generator of JSON chunks; the pooled connection is released when it closes"""
+    def generate():
+        with db_connection(readonly=True) as conn:
+            cursor = stream_cursor(conn)
+            if text:
+                with metrics.query(name):
+                    cursor.execute(compile_sql(text), params)
+            else:
+                execute(cursor, name, params)
+            yield from stream_json(cursor, skip_last=skip_last, default=json_default)
+            yield '\n'
+
+    chunks = generate()
+    # Run the query before the response starts so database errors still produce a 500
+    first = next(chunks)
+    return _prepend(first, chunks)
+
+def _prepend(first, chunks):
+    yield first
+    try:
+        yield from chunks
+    finally:
+        chunks.close()
+
+# ============= PRODUCT ENDPOINTS =============
+
+routes = web.RouteTableDef()
+
+@routes.get('/api/products')
+async def get_products(request):
+    """Active products, paginated, projected or streamed exactly as in api.py"""
+    category, stream, after, limit, fields = handlers.product_query(request.query)
+    if stream:
+        return await stream_response(request, 'product_listing', [category] if category else [],
+                                     text=product_page_text(fields, bool(category), False, False), skip_last=3)
+
+    async def load():
+        columns, rows = await fetch_rows('product_page', product_page_params(category, after, limit),
+                                         text=product_page_text(fields, bool(category), bool(after), bool(limit)))
+        return finish_product_page(columns, rows, limit, as_json=True, json_default=json_default)
+
+    return await catalog_response(request, ('products', category, after, limit, fields), load,
+                                  encoder=handlers.encode_page)
+
+@routes.get('/api/products/search')
+async def search_products(request):
+    """Ranked full-text search over products and jerky products (?q=&limit=)"""
+    query, limit = handlers.search_query(request.query)
+
+    async def load():
+        params = search_params(query, limit)
+        return await fetch_dicts('search_catalog', params) if params else []
+
+    return await catalog_response(request, ('search', query.lower(), limit), load)
+
+@routes.get(r'/api/products/{product_id:\d+}')
+async def get_product(request):
+    """Get a single product by ID"""
+    product_id = int(request.match_info['product_id'])
+    response = await catalog_response(request, ('product', product_id),
+                                      lambda: fetch_one_dict('product_by_id', (product_id,)))
+    return response or json_response({'error': 'Product not found'}, 404)
+
+# ============= CATEGORY ENDPOINTS =============
+
+@routes.get('/api/categories')
+async def get_categories(request):
+    """Get all categories"""
+    return await catalog_response(request, ('categories',), lambda: fetch_json('categories'))
+
+# ============= JERKY PRODUCTS ENDPOINTS =============
+
+@routes.get('/api/jerky-products')
+async def get_jerky_products(request):
+    """Get all active jerky products (?stream=1 streams them)"""
+    if handlers.wants_stream(request.query):
+        return await stream_response(request, 'jerky_products')
+    return await catalog_response(request, ('jerky_products',), lambda: fetch_json('jerky_products'))
+
+@routes.get(r'/api/jerky-products/{jerky_id:\d+}')
+async def get_jerky_product(request):
+    """Get a single jerky product by ID"""
+    jerky_id = int(request.match_info['jerky_id'])
+    response = await catalog_response(request, ('jerky_product', jerky_id),
+                                      lambda: fetch_one_dict('jerky_product_by_id', (jerky_id,)))
+    return response or json_response({'error': 'Jerky product not found'}, 404)
+
+# ============= ORDER ENDPOINTS =============
+
+@routes.post('/api/orders')
+async def create_order(request):
+    """Create a new order; placing it runs its blocking transaction in the executor"""
+    data = await read_json(request)
+    await sync_catalog_version()
+    return reply(await run_blocking(handlers.create_order, data))
+
+@routes.get('/api/orders/{order_number}')
+async def get_order(request):
+    """Get order details by order number"""
+    order_number = request.match_info['order_number']
+    if handlers.order_queue:
+        queued = await run_blocking(handlers.queued_order, order_number)
+        if queued:
+            return json_response(queued)
+
+    async def load():
+        return handlers.committed_order(order_from_row(await fetch_one_dict('order_by_number', (order_number,))))
+
+    return reply(handlers.order_lookup(await order_cache.get_or_load_async(order_number, load)))
+
+# ============= NEWSLETTER ENDPOINT =============
+
+@routes.post('/api/newsletter/subscribe')
+async def subscribe_newsletter(request):
+    """Subscribe to newsletter"""
+    email = handlers.newsletter_email(await read_json(request))
+
+    try:
+        # Resolves once the batch holding this email is committed
+        subscribed = await asyncio.wrap_future(newsletter_writer.subscribe(email))
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+
+    return reply(handlers.newsletter_reply(subscribed))
+
+# ============= STATS ENDPOINTS =============
+
+async def fetch_stats(name, params=()):
+    """Stats rows as dicts; asyncpg binds DATE parameters from date objects, sqlite3 takes ISO strings"""
+    if pg_pool is None:
+        return await run_blocking(handlers.load_stats, name, params)
+    return await fetch_dicts(name, params)
+
+@routes.get('/api/stats/daily-sales')
+async def get_daily_sales(request):
+    """Units and revenue per day for the last ?days= days (default 30)"""
+    return json_response(await fetch_stats('stats_daily_sales', handlers.daily_sales_query(request.query)))
+
+@routes.get('/api/stats/best-sellers')
+async def get_best_sellers(request):
+    """Top products by units sold over the last ?days= days (?limit=, default 10)"""
+    return json_response(await fetch_stats('stats_best_sellers', handlers.best_sellers_query(request.query)))
+
+@routes.get('/api/stats/stock-movement')
+async def get_stock_movement(request):
+    """Units in and out of stock per product, summed from the inventory ledger"""
+    return json_response(await fetch_stats('stats_stock_movement'))
+
+# ============= HEALTH CHECK =============
+
+def pg_pool_stats():
+    if pg_pool is None:
+        return None
+    return {'size': pg_pool.get_size(), 'idle': pg_pool.get_idle_size(), 'max_size': pg_pool.get_max_size()}
+
+def asyncpg_pool_stats():
+    stats = pg_pool_stats()
+    if stats is None:
+        return {}
+    return {'asyncpg': dict(stats, in_use=stats['size'] - stats['idle'])}
+
+handlers.register_gauges(asyncpg_pool_stats)
+
+@routes.get('/api/metrics')
+async def get_metrics(request):
+    """Request, query, pool and cache metrics in Prometheus text format"""
+    # Rendering reads the blocking pools' stats, which opens them on first use
+    body = await run_blocking(metrics.REGISTRY.render)
+    return web.Response(text=body, headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+@routes.get('/api/health')
+async def health_check(request):
+    """Health check endpoint"""
+    # Reading the blocking pools' stats opens them on first use
+    return json_response(await run_blocking(functools.partial(
+        handlers.health,
+        server='asyncio',
+        async_pool=pg_pool_stats(),
+        executor_threads=ASYNC_DB_THREADS,
+    )))
+
+# ============= STATIC ASSETS =============
+
+@routes.get('/')
+async def index_page(request):
+    """index.html from the asset build (python build_assets.py)"""
+    return await serve_static(request, 'index.html')
+
+@routes.get('/{filename:.+}')
+async def static_file(request):
+    """Built assets in the smallest encoding the client accepts"""
+    return await serve_static(request, request.match_info['filename'])
+
+async def serve_static(request, filename):
+    resolved = static_assets.resolve(filename, request.headers.get('Accept-Encoding', ''))
+    if resolved is None:
+        return json_response({'error': 'Not found'}, 404)
+
+    path, content_type, encoding, cache_control = resolved
+    headers = {'Content-Type': content_type, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return web.FileResponse(path, headers=headers)
+
+# ============= APPLICATION =============
+
+async def start_order_workers(app):
+    if order_workers:
+        order_workers.start()
+
+async def stop_background_work(app):
+    if order_workers:
+        order_workers.stop()
+    executor.shutdown(wait=False)
+
+def create_app():
+    app = web.Application(middlewares=[cors, record_request_metrics, request_errors])
+    app.add_routes(routes)
+    app.on_startup.append(open_pg_pool)
+    app.on_startup.append(start_order_workers)
+    app.on_cleanup.append(close_pg_pool)
+    app.on_cleanup.append(stop_background_work)
+    return app
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Asyncio API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"🚀 Starting asyncio API server with {DB_TYPE.upper()} database...")
+    web.run_app(create_app(), host=args.host, port=args.port, access_log=None)
@@ -0,0 +1,111 @@
+"""
+Requests/sec and latency of the threaded Flask server vs the asyncio server
+
+Usage:
+    python benchmarks/bench_async.py [--clients 50 500] [--seconds 5] [--cache-ttl 0]
+
+Both servers run as subprocesses against the same throwaway SQLite
+database with the same pool size, and an aiohttp client drives a mix of
+catalog page, single product and category reads from N concurrent
+clients. The catalog cache is off by default so every request reaches
+the database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+import common
+
+async def drive(base, clients, seconds, products):
+    """Run clients concurrent request loops for seconds; returns (latencies, errors)"""
+    import aiohttp
+
+    paths = [lambda rng: '/api/products?limit=20',
+             lambda rng: f'/api/products/{rng.randint(1, products)}',
+             lambda rng: '/api/categories']
+    latencies = []
+    errors = 0
+
+    async def client(seed, session, deadline):
+        nonlocal errors
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            path = rng.choice(paths)(rng)
+            start = time.perf_counter()
+            try:
+                async with session.get(base + path) as response:
+                    await response.read()
+                    ok = response.status == 200
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await common.wait_ready(session, base)
+        # Warm up connections and the server's pools
+        await asyncio.gather(*(client(-i, session, time.monotonic() + 1) for i in range(clients)))
+        latencies.clear()
+        errors = 0
+        deadline = time.monotonic() + seconds
+        await asyncio.gather(*(client(i, session, deadline) for i in range(clients)))
+    return latencies, errors
+
+def run(server, clients, args):
+    port = common.free_port()
+    process = common.start_server(__file__, server, port)
+    try:
+        latencies, errors = asyncio.run(drive(f'http://127.0.0.1:{port}', clients, args.seconds, args.products))
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        'requests_per_s': len(latencies) / args.seconds,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99_ms': common.percentile(latencies, 0.99) * 1000 if latencies else 0,
+        'errors': errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--pool-size', type=int, default=10, help='DB_POOL_MAX_SIZE for both servers')
+    parser.add_argument('--cache-ttl', type=float, default=0, help='CATALOG_CACHE_TTL for both servers')
+    parser.add_argument('--serve', choices=common.SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        common.serve(args.serve, args.port)
+        return
+
+    path = common.setup_sqlite(products=args.products)
+    os.environ['DB_POOL_MAX_SIZE'] = str(args.pool_size)
+    os.environ['CATALOG_CACHE_TTL'] = str(args.cache_ttl)
+    os.environ['SLOW_QUERY_MS'] = '1000000'
+
+    print(f"\n🐻 {args.seconds:g}s per run over {args.products:,} products, pool size {args.pool_size}, "
+          f"catalog cache TTL {args.cache_ttl:g}s\n")
+    print(f"{'server':<9} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    results = []
+    for clients in args.clients:
+        for server in common.SERVERS:
+            result = run(server, clients, args)
+            results.append(dict(result, server=server, clients=clients))
+            print(f"{server:<9} {clients:>8} {result['requests_per_s']:>9.0f} {result['p50_ms']:>9.2f} "
+                  f"{result['p99_ms']:>9.2f} {result['errors']:>7}")
+    os.remove(path)
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
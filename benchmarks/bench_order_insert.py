@@ -0,0 +1,85 @@
+"""
+Compare per-item and batched order line writes for carts of 1, 10 and 100 items
+
+Usage:
+    python benchmarks/bench_order_insert.py            # throwaway SQLite database
+    python benchmarks/bench_order_insert.py --postgres # configured PostgreSQL database
+
+Every run is rolled back, so the target database is left unchanged.
+"""
+import argparse
+import os
+
+import common
+
+def legacy_insert_order_lines(cursor, order_id, items, placeholder):
+    """The original three-statements-per-item loop from create_order"""
+    for item in items:
+        cursor.execute(f'''
+            INSERT INTO order_items (order_id, product_id, product_name, quantity, unit_price, subtotal)
+            VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
+        ''', (order_id, item['id'], item['name'], item['quantity'], item['price'],
+              item['price'] * item['quantity']))
+        cursor.execute(f'''
+            UPDATE products SET stock_quantity = stock_quantity - {placeholder}
+            WHERE id = {placeholder}
+        ''', (item['quantity'], item['id']))
+        cursor.execute(f'''
+            INSERT INTO inventory_transactions (product_id, transaction_type, quantity_change, reference_id)
+            VALUES ({placeholder}, 'sale', {placeholder}, {placeholder})
+        ''', (item['id'], -item['quantity'], order_id))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--postgres', action='store_true', help='use the configured PostgreSQL database')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if not args.postgres:
+        common.setup_sqlite(products=100)
+
+    from db_config import Database, DB_TYPE
+    from orders import insert_order_lines
+
+    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
+    conn = Database().connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, name, price FROM products ORDER BY id LIMIT 100')
+    catalog = [dict(row) for row in cursor.fetchall()]
+    conn.rollback()
+
+    def run(writer, items):
+        def once():
+            # Orders need a customer row to satisfy the foreign key
+            cursor.execute(f'''
+                INSERT INTO customers (email) VALUES ({placeholder})
+            ''', ('bench@example.com',))
+            cursor.execute('SELECT MAX(id) AS id FROM customers')
+            customer_id = cursor.fetchone()['id']
+            cursor.execute(f'''
+                INSERT INTO orders (order_number, customer_id, subtotal, total)
+                VALUES ({placeholder}, {placeholder}, 0, 0)
+            ''', ('BENCH-0001', customer_id))
+            cursor.execute('SELECT MAX(id) AS id FROM orders')
+            writer(cursor, cursor.fetchone()['id'], items)
+            conn.rollback()
+        return common.timed(once, args.repeat)
+
+    print(f'Backend: {DB_TYPE}, {args.repeat} runs per cart size')
+    print(f"{'items':>6} {'per-item ms':>12} {'batched ms':>11} {'speedup':>8}")
+    for size in (1, 10, 100):
+        items = [
+            {'id': p['id'], 'name': p['name'], 'price': float(p['price']), 'quantity': 1,
+             'subtotal': float(p['price'])}
+            for p in catalog[:size]
+        ]
+        legacy = run(lambda c, o, i: legacy_insert_order_lines(c, o, i, placeholder), items)
+        batched = run(insert_order_lines, items)
+        print(f'{size:>6} {legacy:>12.3f} {batched:>11.3f} {legacy / batched:>7.1f}x')
+
+    conn.close()
+    if not args.postgres:
+        os.remove(os.environ['SQLITE_DB_PATH'])
+
+if __name__ == '__main__':
+    main()
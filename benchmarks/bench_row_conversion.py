@@ -0,0 +1,75 @@
+"""
+Row conversion and JSON encoding: dict_from_row vs RowShape
+
+Usage:
+    python benchmarks/bench_row_conversion.py [--rows 100000] [--repeat 3]
+
+Times a full product listing query three ways on a throwaway SQLite
+database: sqlite3.Row + dict_from_row + json.dumps (the old path),
+tuple rows + RowShape.dicts + json.dumps, and tuple rows encoded
+straight to JSON with RowShape.json_array.
+"""
+import argparse
+import json
+
+import common
+
+QUERY = '''
+    SELECT p.*, c.name AS category_name, c.slug AS category_slug
+    FROM products p
+    JOIN categories c ON p.category_id = c.id
+    ORDER BY p.id
+'''
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    common.setup_sqlite(products=args.rows)
+
+    from db_config import db_connection, dict_from_row
+    from rows import RowShape, tuple_cursor
+
+    with db_connection() as conn:
+        def old_convert():
+            cursor = conn.cursor()
+            cursor.execute(QUERY)
+            return [dict_from_row(row) for row in cursor.fetchall()]
+
+        def new_convert():
+            cursor = tuple_cursor(conn)
+            cursor.execute(QUERY)
+            return RowShape.from_cursor(cursor, sort_keys=False).dicts(cursor.fetchall())
+
+        def fetch_only():
+            cursor = tuple_cursor(conn)
+            cursor.execute(QUERY)
+            return cursor.fetchall()
+
+        def new_stream():
+            cursor = tuple_cursor(conn)
+            cursor.execute(QUERY)
+            return RowShape.from_cursor(cursor).json_array(cursor.fetchall())
+
+        old_json = json.dumps(old_convert(), sort_keys=True, separators=(',', ':'))
+        assert json.loads(new_stream()) == json.loads(old_json), 'encodings differ'
+
+        print(f"🐻 {args.rows:,} rows, mean of {args.repeat} runs\n")
+        print(f"{'method':<40} {'ms':>9}")
+        results = [
+            ('fetch tuples only', common.timed(fetch_only, args.repeat)),
+            ('Row + dict_from_row', common.timed(old_convert, args.repeat)),
+            ('tuples + RowShape.dicts', common.timed(new_convert, args.repeat)),
+            ('Row + dict_from_row + json.dumps', common.timed(
+                lambda: json.dumps(old_convert(), sort_keys=True), args.repeat)),
+            ('tuples + RowShape.dicts + json.dumps', common.timed(
+                lambda: json.dumps(new_convert(), sort_keys=True), args.repeat)),
+            ('tuples + RowShape.json_array', common.timed(new_stream, args.repeat)),
+        ]
+        for name, ms in results:
+            print(f"{name:<40} {ms:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure catalog search latency at 10k and 100k products
+
+Usage:
+    python benchmarks/bench_search.py [--sizes 10000 100000] [--repeat 50]
+
+Compares the FTS5-backed search_catalog against a LIKE scan with the same
+ORDER BY as the product listing, which is what filtering the catalog costs
+without a search index.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import common
+
+QUERIES = ['bear', 'hoodie cozy', 'tahoe lake', 'spic', 'smoky jerky', 'kalomi', 'tenrashi', 'alpine ridge trail']
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def measure(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(samples), percentile(samples, 95)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'products':>9} {'fts mean ms':>12} {'fts p95 ms':>11} {'like mean ms':>13} {'like p95 ms':>12}")
+    for size in args.sizes:
+        path = common.setup_sqlite(products=size)
+
+        import sqlite3
+        from search import search_catalog
+
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        def fts(query):
+            search_catalog(cursor, query, args.limit)
+
+        def like(query):
+            conditions = ' AND '.join(['(name LIKE ? OR description LIKE ?)'] * len(query.split()))
+            params = [f'%{term}%' for term in query.split() for _ in range(2)]
+            cursor.execute(f'''
+                SELECT id, name, description, price FROM products
+                WHERE is_active = 1 AND {conditions}
+                ORDER BY featured DESC, name
+                LIMIT {args.limit}
+            ''', params)
+            cursor.fetchall()
+
+        fts_mean, fts_p95 = measure(fts, QUERIES, args.repeat)
+        like_mean, like_p95 = measure(like, QUERIES, args.repeat)
+        print(f'{size:>9} {fts_mean:>12.3f} {fts_p95:>11.3f} {like_mean:>13.3f} {like_p95:>12.3f}')
+
+        conn.close()
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
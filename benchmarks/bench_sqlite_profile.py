@@ -0,0 +1,136 @@
+"""
+Concurrent catalog reads during checkouts: default vs production SQLite profile
+
+Usage:
+    python benchmarks/bench_sqlite_profile.py [--readers 8] [--writers 2] [--seconds 5]
+
+Each profile runs in its own process against a fresh throwaway database.
+Readers page through the catalog and look up single products while
+writers place orders, so the default profile's rollback journal makes
+readers wait for every commit.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import common
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_profile(args):
+    common.setup_sqlite(products=args.products)
+    os.environ['DB_POOL_MAX_SIZE'] = str(args.readers + args.writers)
+
+    from db_config import db_connection, run_transaction
+    from catalog import fetch_product_page
+    from orders import place_order
+    from queries import fetch_one
+    from rows import tuple_cursor
+
+    stop = threading.Event()
+    read_latencies = []
+    write_latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            with db_connection(readonly=True) as conn:
+                if rng.random() < 0.5:
+                    fetch_product_page(tuple_cursor(conn), limit=50)
+                else:
+                    fetch_one(conn.cursor(), 'product_by_id', (rng.randint(1, args.products),))
+            latencies.append(time.perf_counter() - start)
+        with lock:
+            read_latencies.extend(latencies)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        latencies = []
+        n = 0
+        while not stop.is_set():
+            items = [
+                {'id': product_id, 'name': f'Product {product_id}', 'price': 10.0,
+                 'quantity': 1, 'subtotal': 10.0}
+                for product_id in rng.sample(range(1, args.products + 1), 3)
+            ]
+            cart = {'items': items, 'subtotal': 30.0, 'tax': 2.33, 'shipping_cost': 5.99, 'total': 38.32}
+            data = {
+                'customer_email': f'bench-{seed}-{n}@example.com',
+                'shipping_address': {'street_address': '1 Lake St', 'city': 'Tahoe City',
+                                     'state': 'CA', 'postal_code': '96145'},
+            }
+            n += 1
+            start = time.perf_counter()
+            try:
+                with db_connection() as conn:
+                    run_transaction(conn, lambda cursor: place_order(cursor, data, cart))
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+        with lock:
+            write_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        'reads_per_s': len(read_latencies) / args.seconds,
+        'read_p50_ms': statistics.median(read_latencies) * 1000,
+        'read_p99_ms': percentile(read_latencies, 0.99) * 1000,
+        'read_max_ms': max(read_latencies) * 1000,
+        'writes_per_s': len(write_latencies) / args.seconds,
+        'write_p99_ms': percentile(write_latencies, 0.99) * 1000 if write_latencies else 0,
+        'write_errors': len(errors),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        os.environ['SQLITE_PROFILE'] = args.profile
+        run_profile(args)
+        return
+
+    print(f"🐻 {args.readers} readers + {args.writers} writers for {args.seconds:g}s "
+          f"over {args.products:,} products\n")
+    print(f"{'profile':<12} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'writes/s':>9} {'w p99 ms':>9} {'errors':>7}")
+    for profile in ('default', 'production'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile,
+             '--readers', str(args.readers), '--writers', str(args.writers),
+             '--seconds', str(args.seconds), '--products', str(args.products)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{profile:<12} {result['reads_per_s']:>9.0f} {result['read_p50_ms']:>8.2f} "
+              f"{result['read_p99_ms']:>8.2f} {result['read_max_ms']:>8.1f} "
+              f"{result['writes_per_s']:>9.0f} {result['write_p99_ms']:>9.2f} {result['write_errors']:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Peak memory of buffered vs streamed product listings
+
+Usage:
+    python benchmarks/bench_streaming.py [--sizes 10000 100000]
+
+Requests the full product listing through the Flask test client, once
+buffered (GET /api/products) and once streamed (GET /api/products?stream=1),
+and reports the peak Python heap allocation of each with tracemalloc.
+The streamed peak should stay flat as the catalog grows.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import common
+
+def measure(size):
+    common.setup_sqlite(products=size)
+    os.environ['CATALOG_CACHE_TTL'] = '0'
+    sys.path.insert(0, common.ROOT)
+    import api
+
+    client = api.app.test_client()
+    client.get('/api/products?limit=1')  # warm up imports and the pool
+
+    for label, url in (('buffered', '/api/products'), ('stream', '/api/products?stream=1')):
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(url, buffered=False)
+        received = sum(len(chunk) for chunk in response.iter_encoded())
+        response.close()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size:>10,} {label:<9} {received / 1e6:>9.1f} {peak / 1e6:>9.1f} {elapsed * 1000:>9.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        measure(args.size)
+        return
+
+    print(f"🐻 Full product listing, buffered vs streamed\n")
+    print(f"{'products':>10} {'mode':<9} {'body MB':>9} {'peak MB':>9} {'ms':>9}")
+    for size in args.sizes:
+        # A fresh process per size so module state and caches start empty
+        subprocess.run([sys.executable, __file__, '--size', str(size)], check=True)
+
+if __name__ == '__main__':
+    main()
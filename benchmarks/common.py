@@ -0,0 +1,121 @@
+"""Shared setup for the benchmark scripts"""
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'database'))
+
+# Vocabulary for synthetic product names and descriptions
+WORDS = (
+    'bear tahoe lake pine trail summit cabin grid hoodie beanie trucker sticker '
+    'vinyl cotton fleece snow powder sunset ridge creek alpine cozy classic '
+    'vintage wild jerky spicy smoky coyote lynx moon camp fire kayak'
+).split()
+
+# Long tail of pseudo-words so term frequencies look like a real catalog
+_SYLLABLES = ['ka', 'lo', 'mi', 'ten', 'ra', 'vo', 'shi', 'bel', 'dor', 'ny', 'qua', 'zen']
+_tail_rng = random.Random(7)
+TAIL_WORDS = sorted({''.join(_tail_rng.choices(_SYLLABLES, k=3)) for _ in range(5000)})
+
+def synthetic_text(rng, words):
+    return ' '.join(
+        rng.choice(WORDS) if rng.random() < 0.2 else rng.choice(TAIL_WORDS)
+        for _ in range(words)
+    )
+
+def setup_sqlite(products=100, path=None):
+    """
+    Create a throwaway SQLite database with the migrated schema and a
+    synthetic catalog, and point SQLITE_DB_PATH at it.
+    Must run before db_config is imported.
+    """
+    import sqlite3
+
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='tbj-bench-', suffix='.db')
+        os.close(fd)
+    os.environ['DB_TYPE'] = 'sqlite'
+    os.environ['SQLITE_DB_PATH'] = path
+
+    from migrate import migrate
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    conn.executemany('''
+        INSERT OR IGNORE INTO categories (name, slug, description, display_order)
+        VALUES (?, ?, ?, ?)
+    ''', [
+        ('T-Shirts', 'tshirts', 'Comfortable and stylish t-shirts', 1),
+        ('Sweaters', 'sweaters', 'Cozy sweaters and hoodies', 2),
+        ('Hats', 'hats', 'Hats and beanies for all seasons', 3),
+        ('Stickers', 'stickers', 'Weatherproof vinyl stickers', 4),
+    ])
+    rng = random.Random(42)
+    conn.executemany('''
+        INSERT OR IGNORE INTO products
+        (name, slug, category_id, description, price, emoji, stock_quantity, is_active, featured)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+    ''', [
+        (f'Product {i} {synthetic_text(rng, 2).title()}', f'product-{i}', i % 4 + 1,
+         synthetic_text(rng, 12), round(5 + (i % 50) * 1.5, 2), '🐻', 1_000_000, int(i % 10 == 0))
+        for i in range(1, products + 1)
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+def timed(fn, repeat):
+    """Run fn repeat times and return the mean duration in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+SERVERS = ('flask', 'asyncio')
+
+def serve(server, port):
+    """Run api.py (threaded werkzeug) or api_async.py in this process until killed"""
+    sys.path.insert(0, ROOT)
+    if server == 'flask':
+        from werkzeug.serving import run_simple
+        import api
+        run_simple('127.0.0.1', port, api.app, threaded=True)
+    else:
+        from aiohttp import web
+        import api_async
+        web.run_app(api_async.create_app(), host='127.0.0.1', port=port, access_log=None, print=None)
+
+def start_server(script, server, port):
+    """Start script --serve server --port port as a subprocess with this process's environment"""
+    return subprocess.Popen([sys.executable, script, '--serve', server, '--port', str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_ready(session, base, timeout=30):
+    """Poll the health check until the server answers"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(f'{base}/api/health') as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f'Server at {base} did not start')
+        await asyncio.sleep(0.1)
@@ -0,0 +1,299 @@
+"""
+Seed a storefront at scale and replay a mixed traffic load against the API
+
+Usage:
+    python benchmarks/load_test.py [--products 2000] [--customers 1000] [--orders 5000]
+                                   [--clients 32] [--seconds 20] [--server flask|asyncio]
+                                   [--output run.json] [--baseline previous.json]
+    python benchmarks/load_test.py --postgres   # seed and load the configured PostgreSQL database
+
+Seeds a synthetic catalog, customers and order history (through the same
+place_order path as checkout), starts the API server as a subprocess and
+drives it with closed-loop HTTP clients for --seconds after a warm-up.
+The traffic mix is catalog browsing, product detail, checkout, order
+lookup and newsletter signups (see TRAFFIC_MIX). Data and client request
+sequences come from --seed, so two runs differ only in timing.
+
+The report has throughput and p50/p95/p99 latency per endpoint. It is
+printed as JSON on the last line, written to --output, and compared with
+--baseline when given.
+
+--postgres writes synthetic rows to the configured database; point
+POSTGRES_DB at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import common
+
+# Endpoint name -> share of requests
+TRAFFIC_MIX = {
+    'browse': 0.35,          # GET /api/products, by category or page by page
+    'categories': 0.05,      # GET /api/categories
+    'product_detail': 0.30,  # GET /api/products/<id>
+    'checkout': 0.10,        # POST /api/orders
+    'order_lookup': 0.12,    # GET /api/orders/<order_number>
+    'newsletter': 0.08,      # POST /api/newsletter/subscribe
+}
+
+CATEGORY_SLUGS = ('tshirts', 'sweaters', 'hats', 'stickers')
+STREETS = ('Lake St', 'Pine Ave', 'Summit Rd', 'Cabin Ln', 'Ridge Way', 'Creek Dr')
+CITIES = (('Tahoe City', '96145'), ('Kings Beach', '96143'), ('Truckee', '96161'), ('Incline Village', '89451'))
+
+def customer_email(index):
+    return f'load-{index}@example.com'
+
+def customer_addresses(index):
+    """One or two stable addresses per customer, so checkouts reuse them"""
+    rng = random.Random(index)
+    addresses = []
+    for _ in range(1 + (index % 3 == 0)):
+        city, postal_code = rng.choice(CITIES)
+        addresses.append({
+            'street_address': f'{rng.randint(1, 9999)} {rng.choice(STREETS)}',
+            'city': city,
+            'state': 'NV' if postal_code.startswith('89') else 'CA',
+            'postal_code': postal_code,
+        })
+    return addresses
+
+def order_request(rng, customers, products):
+    """A checkout body for a random known customer, one of their addresses and 1-3 products"""
+    index = rng.randrange(customers)
+    return {
+        'customer_email': customer_email(index),
+        'first_name': 'Load',
+        'last_name': f'Customer {index}',
+        'shipping_address': rng.choice(customer_addresses(index)),
+        'items': [{'id': product_id, 'quantity': rng.randint(1, 3)}
+                  for product_id in rng.sample(range(1, products + 1), rng.randint(1, 3))],
+    }
+
+def seed_postgres_catalog(products):
+    """Migrate the configured PostgreSQL database and import the synthetic catalog"""
+    from db_config import db_connection, run_transaction
+    from import_catalog import import_catalog
+    from migrate import migrate
+
+    rng = random.Random(42)
+    catalog = {
+        'categories': [{'name': slug.title(), 'slug': slug, 'display_order': i}
+                       for i, slug in enumerate(CATEGORY_SLUGS, start=1)],
+        'products': [
+            {'name': f'Product {i} {common.synthetic_text(rng, 2).title()}', 'slug': f'product-{i}',
+             'category': CATEGORY_SLUGS[i % 4], 'description': common.synthetic_text(rng, 12),
+             'price': round(5 + (i % 50) * 1.5, 2), 'emoji': '🐻', 'stock_quantity': 1_000_000,
+             'featured': i % 10 == 0}
+            for i in range(1, products + 1)
+        ],
+    }
+    with db_connection() as conn:
+        migrate(conn)
+        run_transaction(conn, lambda cursor: import_catalog(cursor, catalog))
+        # Products the import left alone keep their stock, so top it up for the run
+        cursor = conn.cursor()
+        cursor.execute("UPDATE products SET stock_quantity = 1000000 WHERE slug LIKE 'product-%%'")
+        conn.commit()
+
+def seed_history(customers, orders, products, seed, batch_size=500):
+    """Place orders for the synthetic customers in batches; returns their order numbers"""
+    from db_config import db_connection, run_transaction
+    from orders import place_order
+    from price_index import price_index
+    from queries import fetch_one
+
+    rng = random.Random(seed)
+    requests = [order_request(rng, customers, products) for _ in range(orders)]
+    numbers = []
+
+    def place(batch):
+        def work(cursor):
+            ids = [place_order(cursor, data, price_index.price_cart(data['items'])) for data in batch]
+            return [fetch_one(cursor, 'order_by_id', (order_id,))['order_number'] for order_id in ids]
+        return work
+
+    with db_connection() as conn:
+        for start in range(0, len(requests), batch_size):
+            numbers.extend(run_transaction(conn, place(requests[start:start + batch_size])))
+    return numbers
+
+class Traffic:
+    """Builds (name, method, path, body) requests in the configured mix"""
+
+    def __init__(self, args, order_numbers):
+        self.args = args
+        self.order_numbers = order_numbers
+        self.names = list(TRAFFIC_MIX)
+        self.weights = list(TRAFFIC_MIX.values())
+
+    def next(self, rng, state):
+        name = rng.choices(self.names, self.weights)[0]
+        if name == 'browse':
+            if state.get('cursor') and rng.random() < 0.5:
+                # Keep paging through the listing the client was reading
+                return name, 'GET', f"/api/products?limit=50&cursor={state['cursor']}", None
+            category = rng.choice(CATEGORY_SLUGS + ('all',))
+            return name, 'GET', f'/api/products?limit=50&category={category}', None
+        if name == 'categories':
+            return name, 'GET', '/api/categories', None
+        if name == 'product_detail':
+            return name, 'GET', f'/api/products/{rng.randint(1, self.args.products)}', None
+        if name == 'checkout':
+            return name, 'POST', '/api/orders', order_request(rng, self.args.customers, self.args.products)
+        if name == 'order_lookup':
+            return name, 'GET', f'/api/orders/{rng.choice(self.order_numbers)}', None
+        # A third of signups repeat an address that is already subscribed
+        email = f'news-{rng.randrange(self.args.customers)}@example.com' if rng.random() < 0.33 \
+            else f"news-{state['client']}-{rng.random():.12f}@example.com"
+        return name, 'POST', '/api/newsletter/subscribe', {'email': email}
+
+async def drive(base, traffic, args):
+    """Run the clients through a warm-up and the measured window; returns (latencies, errors) per endpoint"""
+    import aiohttp
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    measuring = False
+
+    async def client(index, session, deadline):
+        rng = random.Random(args.seed * 100_003 + index)
+        state = {'client': index}
+        while time.monotonic() < deadline:
+            name, method, path, body = traffic.next(rng, state)
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base + path, json=body) as response:
+                    await response.read()
+                    ok = response.status < 400
+                    if name == 'browse':
+                        state['cursor'] = response.headers.get('X-Next-Cursor')
+            except aiohttp.ClientError:
+                ok = False
+            if not measuring:
+                continue
+            if ok:
+                latencies[name].append(time.perf_counter() - start)
+            else:
+                errors[name] += 1
+
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await common.wait_ready(session, base)
+        await asyncio.gather(*(client(-1 - i, session, time.monotonic() + args.warmup)
+                               for i in range(args.clients)))
+        measuring = True
+        deadline = time.monotonic() + args.seconds
+        await asyncio.gather(*(client(i, session, deadline) for i in range(args.clients)))
+    return latencies, errors
+
+def summarize(samples, errors, seconds):
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / seconds, 1),
+        'p50_ms': round(statistics.median(samples) * 1000, 2) if samples else None,
+        'p95_ms': round(common.percentile(samples, 0.95) * 1000, 2) if samples else None,
+        'p99_ms': round(common.percentile(samples, 0.99) * 1000, 2) if samples else None,
+    }
+
+def build_report(args, backend, latencies, errors):
+    endpoints = {name: summarize(latencies[name], errors[name], args.seconds) for name in TRAFFIC_MIX}
+    every = [sample for samples in latencies.values() for sample in samples]
+    return {
+        'config': {
+            'backend': backend, 'server': args.server, 'products': args.products,
+            'customers': args.customers, 'orders': args.orders, 'clients': args.clients,
+            'seconds': args.seconds, 'warmup': args.warmup, 'seed': args.seed,
+            'pool_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'sqlite_profile': os.getenv('SQLITE_PROFILE', 'default') if backend == 'sqlite' else None,
+        },
+        'endpoints': endpoints,
+        'total': summarize(every, sum(errors.values()), args.seconds),
+    }
+
+def print_report(report, baseline=None):
+    print(f"{'endpoint':<15} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+          + (f" {'Δ req/s':>8} {'Δ p99':>8}" if baseline else ''))
+    rows = list(report['endpoints'].items()) + [('total', report['total'])]
+    for name, result in rows:
+        line = (f"{name:<15} {result['throughput_rps']:>8.1f} {result['p50_ms'] or 0:>8.2f} "
+                f"{result['p95_ms'] or 0:>8.2f} {result['p99_ms'] or 0:>8.2f} {result['errors']:>7}")
+        previous = baseline and (baseline['total'] if name == 'total' else baseline['endpoints'].get(name))
+        if previous and previous['throughput_rps'] and previous['p99_ms'] and result['p99_ms']:
+            line += (f" {result['throughput_rps'] / previous['throughput_rps'] - 1:>+8.1%}"
+                     f" {result['p99_ms'] / previous['p99_ms'] - 1:>+8.1%}")
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--postgres', action='store_true', help='use the configured PostgreSQL database')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=5000, help='orders seeded as history')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent HTTP clients')
+    parser.add_argument('--seconds', type=float, default=20, help='measured duration')
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server', choices=common.SERVERS, default='flask')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare with')
+    parser.add_argument('--serve', choices=common.SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        common.serve(args.serve, args.port)
+        return
+
+    path = None
+    if args.postgres:
+        os.environ['DB_TYPE'] = 'postgresql'
+        seed_postgres_catalog(args.products)
+    else:
+        path = common.setup_sqlite(products=args.products)
+        os.environ['SLOW_QUERY_MS'] = os.getenv('SLOW_QUERY_MS', '1000')
+
+    from db_config import DB_TYPE
+
+    print(f"🐻 Seeding {args.customers:,} customers and {args.orders:,} orders "
+          f"over {args.products:,} products ({DB_TYPE})")
+    start = time.perf_counter()
+    order_numbers = seed_history(args.customers, args.orders, args.products, args.seed)
+    print(f"✓ Seeded in {time.perf_counter() - start:.1f}s")
+
+    print(f"🚦 {args.clients} clients for {args.seconds:g}s against the {args.server} server "
+          f"(after {args.warmup:g}s warm-up)\n")
+    port = common.free_port()
+    server = common.start_server(__file__, args.server, port)
+    try:
+        latencies, errors = asyncio.run(drive(f'http://127.0.0.1:{port}', Traffic(args, order_numbers), args))
+    finally:
+        server.terminate()
+        server.wait()
+        if path:
+            os.remove(path)
+
+    report = build_report(args, DB_TYPE, latencies, errors)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.output}")
+    print(json.dumps(report))
+    if report['total']['errors']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Generate order numbers from many processes and threads and check for collisions
+
+Usage:
+    python benchmarks/stress_order_numbers.py [--total 100000] [--processes 4] [--threads 8]
+
+Exits non-zero if any number repeats or a thread ever sees a number that
+does not sort after its previous one.
+"""
+import argparse
+import multiprocessing
+import sys
+import threading
+import time
+
+import common  # noqa: F401  (puts database/ on sys.path)
+
+def generate(count, threads):
+    """Run in a worker process: generate count numbers across threads"""
+    from order_numbers import order_numbers
+
+    results = [None] * threads
+    per_thread = count // threads
+
+    def worker(index):
+        numbers = [order_numbers.next() for _ in range(per_thread)]
+        monotonic = all(a < b for a, b in zip(numbers, numbers[1:]))
+        results[index] = (numbers, monotonic)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--total', type=int, default=100_000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    per_process = args.total // args.processes
+    start = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(args.processes) as pool:
+        batches = pool.starmap(generate, [(per_process, args.threads)] * args.processes)
+    elapsed = time.perf_counter() - start
+
+    all_numbers = []
+    monotonic = True
+    for process_results in batches:
+        for numbers, thread_monotonic in process_results:
+            all_numbers.extend(numbers)
+            monotonic = monotonic and thread_monotonic
+
+    unique = len(set(all_numbers))
+    print(f'Generated {len(all_numbers)} numbers in {elapsed:.2f}s '
+          f'({args.processes} processes x {args.threads} threads)')
+    print(f'Unique: {unique}, per-thread monotonic: {monotonic}')
+    print(f'Example: {all_numbers[0]}')
+
+    ok = unique == len(all_numbers) and monotonic
+    print('✓ No collisions' if ok else '❌ Collision or ordering violation')
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Hammer a single hot product with concurrent checkouts and check it never oversells
+
+Usage:
+    python benchmarks/stress_stock_reservation.py [--threads 16] [--orders 40] [--stock 100]
+
+Runs against a throwaway SQLite database through the Flask test client.
+Exits non-zero if stock goes negative or the ledger disagrees with it.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+from collections import Counter
+
+import common
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=40, help='checkouts per thread')
+    parser.add_argument('--stock', type=int, default=100, help='starting stock of the hot product')
+    args = parser.parse_args()
+
+    path = common.setup_sqlite(products=10)
+    os.environ['DB_POOL_MAX_SIZE'] = str(args.threads)
+    os.environ['CATALOG_CACHE_TTL'] = '0'
+
+    import sqlite3
+    conn = sqlite3.connect(path)
+    conn.execute('UPDATE products SET stock_quantity = ? WHERE id = 1', (args.stock,))
+    conn.commit()
+    conn.close()
+
+    sys.path.insert(0, common.ROOT)
+    import api
+
+    statuses = Counter()
+    sold = Counter()
+    lock = threading.Lock()
+
+    def worker(thread_id):
+        client = api.app.test_client()
+        for n in range(args.orders):
+            quantity = random.randint(1, 3)
+            response = client.post('/api/orders', json={
+                'customer_email': f'stress-{thread_id}-{n}@example.com',
+                'items': [
+                    {'id': 1, 'name': 'Product 1', 'price': 10.0, 'quantity': quantity},
+                    {'id': random.randint(2, 10), 'name': 'Filler', 'price': 5.0, 'quantity': 1},
+                ],
+                'shipping_address': {
+                    'street_address': '1 Lake St', 'city': 'Kings Beach',
+                    'state': 'CA', 'postal_code': '96143',
+                },
+            })
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code == 201:
+                    sold[1] += quantity
+                elif response.status_code not in (409,):
+                    print(f'Unexpected {response.status_code}: {response.get_json()}')
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    conn = sqlite3.connect(path)
+    stock = conn.execute('SELECT stock_quantity FROM products WHERE id = 1').fetchone()[0]
+    ledger = conn.execute('''
+        SELECT COALESCE(SUM(quantity_change), 0) FROM inventory_transactions WHERE product_id = 1
+    ''').fetchone()[0]
+    conn.close()
+    os.remove(path)
+
+    print(f'Responses: {dict(statuses)}')
+    print(f'Units sold: {sold[1]}, remaining stock: {stock}, ledger change: {ledger}')
+
+    ok = stock >= 0 and stock == args.stock - sold[1] and ledger == -sold[1] and set(statuses) <= {201, 409}
+    print('✓ No oversell' if ok else '❌ Stock invariant violated')
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
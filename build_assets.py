@@ -0,0 +1,317 @@
+"""
+Build fingerprinted, precompressed frontend assets into dist/
+
+Usage:
+    python build_assets.py [--out dist] [--no-images] [--no-brotli]
+
+styles.css, script.js and the images are copied to content-hashed names
+(styles.3f9c2e1a0b.css), so they can be cached forever; index.html is
+rewritten to reference them and keeps its name. Text files also get .gz
+and .br siblings. Each image gets resized WebP and JPEG/PNG variants, and
+<img> tags become <picture> elements with srcset.
+
+Pillow and brotli are in requirements.txt and the build fails without
+them. --no-images copies the images without variants and --no-brotli
+writes gzip only, for builds that deliberately skip them.
+
+dist/manifest.json maps every source name to its built files. api.py and
+api_async.py serve dist/ using the helpers at the bottom of this file:
+the smallest encoding the client accepts, immutable caching for hashed
+files and revalidation for index.html.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Load environment variables
+load_dotenv()
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.getenv('STATIC_DIR', os.path.join(ROOT, 'dist'))
+
+ENTRY_PAGE = 'index.html'
+TEXT_ASSETS = ('styles.css', 'script.js')
+IMAGE_ASSETS = ('bear_logo.png', 'tahoe_map.png', 'ugly-sweater.png')
+
+# Widths generated for each image, up to its own width
+IMAGE_WIDTHS = (100, 400, 800, 1600)
+# sizes attribute per image; the logo renders at 50px (.logo-icon)
+IMAGE_SIZES = {'bear_logo.png': '50px'}
+DEFAULT_IMAGE_SIZES = '100vw'
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+COMPRESSIBLE = {'.html', '.css', '.js', '.json', '.svg'}
+# Preference when the client accepts several
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_MAX_AGE = 31536000  # one year
+
+mimetypes.add_type('image/webp', '.webp')
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+
+def write_file(out, name, data):
+    with open(os.path.join(out, name), 'wb') as f:
+        f.write(data)
+
+def write_compressed(out, name, data, with_brotli=True):
+    """Write .gz (and .br) siblings when they are smaller than the file itself"""
+    if os.path.splitext(name)[1] not in COMPRESSIBLE:
+        return []
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if with_brotli:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            write_file(out, name + suffix, compressed)
+            written.append(suffix)
+    return written
+
+def encode_image(image, fmt):
+    from io import BytesIO
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+    elif fmt == 'jpeg':
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+def image_variants(out, name, data):
+    """
+    Resized WebP and fallback variants of an image as
+    {'webp': [(width, file)], 'fallback': [(width, file)]}, smallest first
+    Images with transparency fall back to PNG, others to JPEG.
+    """
+    from io import BytesIO
+    with Image.open(BytesIO(data)) as original:
+        original.load()
+        source_format = (original.format or '').lower()
+    has_alpha = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+    if has_alpha and original.mode != 'RGBA':
+        original = original.convert('RGBA')
+    elif not has_alpha and original.mode != 'RGB':
+        original = original.convert('RGB')
+    fallback = 'png' if has_alpha else 'jpeg'
+    stem = os.path.splitext(name)[0]
+
+    widths = [width for width in IMAGE_WIDTHS if width < original.width] + [original.width]
+    variants = {'webp': [], 'fallback': []}
+    for width in widths:
+        height = round(original.height * width / original.width)
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for kind, fmt in (('webp', 'webp'), ('fallback', fallback)):
+            encoded = encode_image(resized, fmt)
+            if width == original.width and fmt == source_format and len(data) < len(encoded):
+                # Re-encoding at full size did not help; keep the source bytes
+                encoded = data
+            built = fingerprint(f"{stem}-{width}w.{'jpg' if fmt == 'jpeg' else fmt}", encoded)
+            write_file(out, built, encoded)
+            variants[kind].append((width, built))
+    return variants
+
+def rewrite_css_urls(css, assets):
+    """Point url(...) references at built files"""
+    def replace(match):
+        target = match.group(2)
+        return f'url({match.group(1)}{assets.get(target, target)}{match.group(1)})'
+    return re.sub(r'''url\((['"]?)([^'")]+)\1\)''', replace, css)
+
+def srcset(variants):
+    return ', '.join(f'{file} {width}w' for width, file in variants)
+
+def picture_tag(tag, name, image):
+    """Wrap an <img> tag in <picture> with a WebP source and responsive fallbacks"""
+    sizes = re.search(r'\ssizes="([^"]*)"', tag)
+    sizes = sizes.group(1) if sizes else IMAGE_SIZES.get(name, DEFAULT_IMAGE_SIZES)
+    fallback = image['fallback']
+    img = re.sub(r'\ssrc="[^"]*"', f' src="{fallback[-1][1]}"', tag, count=1)
+    img = re.sub(r'\s(?:srcset|sizes)="[^"]*"', '', img)
+    img = img.replace('<img', f'<img srcset="{srcset(fallback)}" sizes="{sizes}"', 1)
+    return (f'<picture><source type="image/webp" srcset="{srcset(image["webp"])}" sizes="{sizes}">'
+            f'{img}</picture>')
+
+def rewrite_html(html, assets, images):
+    """Reference built files from index.html"""
+    def replace_img(match):
+        tag = match.group(0)
+        src = re.search(r'\ssrc="([^"]*)"', tag)
+        if src and src.group(1) in images:
+            return picture_tag(tag, src.group(1), images[src.group(1)])
+        return tag
+
+    html = re.sub(r'<img\s[^>]*>', replace_img, html)
+
+    def replace_attribute(match):
+        target = match.group(2)
+        if target in images:
+            # e.g. the favicon: the smallest fallback variant
+            target = images[target]['fallback'][0][1]
+        return f'{match.group(1)}="{assets.get(target, target)}"'
+
+    return re.sub(r'\b(src|href)="([^"#:]+)"', replace_attribute, html)
+
+def build(out, with_images=True, with_brotli=True):
+    """
+    Build every asset into out; returns the manifest
+    with_images=False skips the image variants and with_brotli=False the .br
+    files; otherwise a missing Pillow or brotli fails the build.
+    """
+    if with_images and Image is None:
+        raise SystemExit("❌ Pillow is not installed (pip install -r requirements.txt); "
+                         "pass --no-images to build without image variants")
+    if with_brotli and brotli is None:
+        raise SystemExit("❌ brotli is not installed (pip install -r requirements.txt); "
+                         "pass --no-brotli to build gzip only")
+
+    if os.path.isdir(out) and os.listdir(out):
+        if not os.path.exists(os.path.join(out, 'manifest.json')):
+            raise SystemExit(f"❌ {out} exists and is not an asset build; refusing to replace it")
+        shutil.rmtree(out)
+    os.makedirs(out, exist_ok=True)
+
+    assets = {}   # source name -> fingerprinted name
+    images = {}   # source name -> variants
+    encodings = {}  # built name -> compressed suffixes
+
+    for name in IMAGE_ASSETS:
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            data = f.read()
+        assets[name] = fingerprint(name, data)
+        write_file(out, assets[name], data)
+        if with_images:
+            images[name] = image_variants(out, name, data)
+
+    for name in TEXT_ASSETS:
+        with open(os.path.join(ROOT, name), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            text = rewrite_css_urls(text, assets)
+        data = text.encode('utf-8')
+        assets[name] = fingerprint(name, data)
+        write_file(out, assets[name], data)
+        encodings[assets[name]] = write_compressed(out, assets[name], data, with_brotli)
+
+    with open(os.path.join(ROOT, ENTRY_PAGE), encoding='utf-8') as f:
+        html = rewrite_html(f.read(), assets, images).encode('utf-8')
+    write_file(out, ENTRY_PAGE, html)
+    encodings[ENTRY_PAGE] = write_compressed(out, ENTRY_PAGE, html, with_brotli)
+
+    manifest = {'assets': assets, 'images': images, 'encodings': encodings}
+    write_file(out, 'manifest.json', json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed assets')
+    parser.add_argument('--out', default=STATIC_DIR)
+    parser.add_argument('--no-images', action='store_true', help='Copy images without WebP and resized variants')
+    parser.add_argument('--no-brotli', action='store_true', help='Write gzip copies only')
+    args = parser.parse_args()
+
+    manifest = build(args.out, with_images=not args.no_images, with_brotli=not args.no_brotli)
+    source = sum(os.path.getsize(os.path.join(ROOT, name)) for name in (ENTRY_PAGE,) + TEXT_ASSETS + IMAGE_ASSETS)
+    for name, built in sorted(manifest['assets'].items()):
+        print(f"  {name:<20} → {built}")
+    print(f"✓ Built {len(os.listdir(args.out))} files into {args.out} "
+          f"({source / 1e6:.1f} MB of sources)")
+
+# ============= SERVING =============
+
+class StaticAssets:
+    """
+    Looks up built files for the servers
+    Only files listed in the manifest (and index.html) are served.
+    """
+
+    def __init__(self, directory=STATIC_DIR):
+        self.directory = directory
+        self._manifest = None
+        self._mtime = None
+
+    def manifest(self):
+        """The current manifest, reloaded after a rebuild; None if nothing is built"""
+        path = os.path.join(self.directory, 'manifest.json')
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with open(path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            files = {ENTRY_PAGE, *manifest['assets'].values()}
+            for variants in manifest['images'].values():
+                files.update(file for kind in variants.values() for _, file in kind)
+            manifest['files'] = files
+            self._manifest, self._mtime = manifest, mtime
+        return self._manifest
+
+    def resolve(self, name, accept_encoding=''):
+        """
+        (path, content type, Content-Encoding or None, Cache-Control) for a
+        built file, or None if it is not one
+        """
+        manifest = self.manifest()
+        if manifest is None or name not in manifest['files']:
+            return None
+        path = os.path.join(self.directory, name)
+        encoding = None
+        accepted = accepted_encodings(accept_encoding)
+        available = manifest['encodings'].get(name, [])
+        for candidate, suffix in ENCODINGS:
+            if candidate in accepted and suffix in available:
+                path, encoding = path + suffix, candidate
+                break
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type.endswith('javascript'):
+            content_type += '; charset=utf-8'
+        if name == ENTRY_PAGE:
+            cache_control = 'no-cache'
+        else:
+            cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        return path, content_type, encoding, cache_control
+
+def accepted_encodings(header):
+    """
+    Codings in an Accept-Encoding header, without those refused with q=0
+    A coding with a malformed q-value is skipped.
+    """
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if quality:
+            try:
+                if float(quality.group(1)) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+static_assets = StaticAssets()
+
+if __name__ == '__main__':
+    main()
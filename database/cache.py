@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '60'))  # seconds
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', '256'))
+# Order lookups are cached only when ORDER_CACHE_TTL > 0
+ORDER_CACHE_TTL = float(os.getenv('ORDER_CACHE_TTL', '0'))  # seconds
+ORDER_CACHE_SIZE = int(os.getenv('ORDER_CACHE_SIZE', '10000'))
+# How often the persisted catalog version is re-read from the database
+CATALOG_VERSION_POLL = float(os.getenv('CATALOG_VERSION_POLL', '5'))  # seconds
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe in-process cache with a time-to-live and an LRU size bound"""
+
+    def __init__(self, ttl=CATALOG_CACHE_TTL, max_size=CATALOG_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generation = 0  # bumped by clear() so in-flight loads are not stored
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return a cached value, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if full"""
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss
+        A loader result of None is not cached
+        """
+        generation = self._generation
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        self._store_loaded(key, value, generation)
+        return value
+
+    async def get_or_load_async(self, key, loader):
+        """get_or_load for a coroutine function loader, e.g. in api_async.py"""
+        generation = self._generation
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = await loader()
+        self._store_loaded(key, value, generation)
+        return value
+
+    def _store_loaded(self, key, value, generation):
+        if value is not None and self.ttl > 0:
+            with self._lock:
+                # Skip storing if invalidated while loading; the value may be stale
+                if generation == self._generation:
+                    self._store(key, value)
+
+    def delete(self, key):
+        """Remove a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+            }
+
+
+class CatalogCache(TTLCache):
+    """
+    Cache for read-only catalog queries (products, categories, jerky products)
+
+    Keys are tuples such as ('products', category_slug) or ('product', id).
+    Every invalidation bumps version; changes to prices, names or active
+    flags also bump catalog_version, which the price index watches.
+    stored_version mirrors the catalog_version table, which bulk imports
+    bump from any process.
+    """
+
+    def __init__(self, ttl=CATALOG_CACHE_TTL, max_size=CATALOG_CACHE_SIZE, poll_interval=CATALOG_VERSION_POLL):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self.version = 1
+        self.catalog_version = 1
+        self.stored_version = None
+        self.poll_interval = poll_interval
+        self._next_poll = 0.0
+
+    def invalidate(self, stock_only=False):
+        """
+        Drop all cached catalog data
+        Pass stock_only=True when only stock quantities changed.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.version += 1
+            if not stock_only:
+                self.catalog_version += 1
+
+    def sync_version(self, load_version):
+        """
+        Drop everything when the persisted catalog version has moved
+        load_version() reads it from the database; it is called at most
+        once every poll_interval seconds.
+        """
+        if self.poll_due():
+            self.observe_version(load_version())
+
+    def poll_due(self):
+        """True at most once every poll_interval seconds, for the caller that should poll"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_poll:
+                return False
+            self._next_poll = now + self.poll_interval
+            return True
+
+    def observe_version(self, stored):
+        """Invalidate everything if the persisted catalog version differs from the last one seen"""
+        if stored != self.stored_version:
+            self.stored_version = stored
+            self.invalidate()
+
+    def stats(self):
+        stats = super().stats()
+        stats['version'] = self.version
+        stats['catalog_version'] = self.catalog_version
+        stats['stored_version'] = self.stored_version
+        return stats
+
+
+catalog_cache = CatalogCache()
+
+# Short-lived cache of order lookups keyed by order number;
+# call order_cache.delete(order_number) whenever an order's status changes
+order_cache = TTLCache(ttl=ORDER_CACHE_TTL, max_size=ORDER_CACHE_SIZE)
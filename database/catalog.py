@@ -0,0 +1,159 @@
+import base64
+import json
+from functools import lru_cache
+from queries import PRODUCT_SELECT, compile_sql
+from rows import RowShape
+import metrics
+
+# Columns a client may request with ?fields=
+PRODUCT_FIELDS = {
+    'id': 'p.id',
+    'name': 'p.name',
+    'slug': 'p.slug',
+    'category_id': 'p.category_id',
+    'description': 'p.description',
+    'price': 'p.price',
+    'image_url': 'p.image_url',
+    'emoji': 'p.emoji',
+    'stock_quantity': 'p.stock_quantity',
+    'is_active': 'p.is_active',
+    'featured': 'p.featured',
+    'created_at': 'p.created_at',
+    'updated_at': 'p.updated_at',
+    'category_name': 'c.name',
+    'category_slug': 'c.slug',
+}
+
+MAX_PAGE_SIZE = 200
+DEFAULT_PAGE_SIZE = 50
+
+class InvalidQueryError(Exception):
+    """Raised for a malformed cursor, limit or field list"""
+
+
+def encode_cursor(featured, name, product_id):
+    """Opaque token for the keyset position (featured, name, id) of a row"""
+    raw = json.dumps([bool(featured), name, product_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises InvalidQueryError for bad tokens"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        featured, name, product_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(name, str) or not isinstance(product_id, int):
+            raise ValueError
+        return bool(featured), name, product_id
+    except (ValueError, TypeError):
+        raise InvalidQueryError('Invalid cursor')
+
+def parse_fields(value):
+    """Validate a comma-separated ?fields= list; None means all columns"""
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+    if unknown or not fields:
+        raise InvalidQueryError(f"Unknown fields: {', '.join(unknown) or value}")
+    return fields
+
+def parse_limit(value, paginated):
+    """Validate ?limit=; None means no limit"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE if paginated else None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidQueryError('limit must be an integer')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise InvalidQueryError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
+@lru_cache(maxsize=256)
+def product_page_text(fields, by_category, resume, limited):
+    """SQL with ? placeholders for one shape of product page query, built once per shape"""
+    if fields:
+        columns = ', '.join(f'{PRODUCT_FIELDS[f]} AS {f}' for f in fields)
+    else:
+        columns = f'{PRODUCT_SELECT}, c.name AS category_name, c.slug AS category_slug'
+    # Sort keys are always selected so the next cursor can be built
+    columns += ', p.featured AS _featured, p.name AS _name, p.id AS _id'
+
+    conditions = ['p.is_active = TRUE']
+    if by_category:
+        conditions.append('c.slug = ?')
+    if resume:
+        conditions.append('''(p.featured < ?
+            OR (p.featured = ? AND (p.name > ?
+                OR (p.name = ? AND p.id > ?))))''')
+
+    sql = f'''
+        SELECT {columns}
+        FROM products p
+        JOIN categories c ON p.category_id = c.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY p.featured DESC, p.name ASC, p.id ASC
+    '''
+    if limited:
+        sql += ' LIMIT ?'
+    return sql
+
+def product_page_sql(fields, by_category, resume, limited):
+    """Compiled SQL for one shape of product page query"""
+    return compile_sql(product_page_text(fields, by_category, resume, limited))
+
+def product_page_params(category=None, after=None, limit=None):
+    """Parameters for product_page_sql, in placeholder order"""
+    params = []
+    if category:
+        params.append(category)
+    if after:
+        featured, name, product_id = after
+        params.extend([featured, featured, name, name, product_id])
+    if limit:
+        # Fetch one extra row to learn whether another page exists
+        params.append(int(limit) + 1)
+    return params
+
+def finish_product_page(columns, rows, limit=None, as_json=False, json_default=None):
+    """
+    Shape fetched page rows into (rows, next_cursor)
+    columns are the result's column names, including the three trailing sort keys.
+    """
+    # The trailing _featured, _name, _id sort keys are left out of the output
+    shape = RowShape(columns[:-3], default=json_default)
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*tuple(rows[-1])[-3:])
+
+    if as_json:
+        return shape.json_array(rows), next_cursor
+    return shape.dicts(rows), next_cursor
+
+def execute_product_listing(cursor, category=None, fields=None):
+    """
+    Run the full active product listing, for streaming
+    The result carries three trailing sort-key columns to skip.
+    """
+    with metrics.query('product_listing'):
+        cursor.execute(product_page_sql(fields, bool(category), False, False),
+                       [category] if category else [])
+    return cursor
+
+def fetch_product_page(cursor, category=None, after=None, limit=None, fields=None,
+                       as_json=False, json_default=None):
+    """
+    Active products ordered by (featured DESC, name, id), resuming after a keyset position
+    cursor must return plain tuples (see rows.tuple_cursor).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    With as_json, rows is a JSON array string encoded without per-row dicts,
+    using json_default for values JSON has no type for.
+    """
+    sql = product_page_sql(fields, bool(category), bool(after), bool(limit))
+    with metrics.query('product_page'):
+        cursor.execute(sql, product_page_params(category, after, limit))
+    rows = metrics.timed_fetch(cursor.fetchall)
+    columns = [column[0] for column in cursor.description]
+    return finish_product_page(columns, rows, limit, as_json, json_default)
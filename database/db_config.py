@@ -1,19 +1,73 @@
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
 import sqlite3
+from metrics import record_acquire
 
 # Load environment variables
 load_dotenv()
 
 DB_TYPE = os.getenv('DB_TYPE', 'sqlite')
 
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_MAX_AGE = float(os.getenv('DB_POOL_MAX_AGE', '1800'))  # seconds
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds
+
+# Transaction retry settings
+DB_TX_RETRIES = int(os.getenv('DB_TX_RETRIES', '5'))
+DB_TX_RETRY_DELAY = float(os.getenv('DB_TX_RETRY_DELAY', '0.02'))  # seconds, doubled per attempt
+
+# Compiled statements SQLite keeps per connection
+SQLITE_STATEMENT_CACHE_SIZE = int(os.getenv('SQLITE_STATEMENT_CACHE_SIZE', '256'))
+
+# 'production' enables WAL, tuned pragmas and the reader/writer pool split
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'default')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # pages, or KiB if negative
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # milliseconds
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which statements it has prepared"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def sqlite_production():
+    """True when SQLite runs with the tuned production profile"""
+    return DB_TYPE != 'postgresql' and SQLITE_PROFILE == 'production'
+
+def apply_sqlite_pragmas(conn, readonly=False):
+    """
+    Tune a SQLite connection for concurrent web traffic
+    WAL lets readers run alongside the writer, and synchronous=NORMAL is
+    durable across application crashes in WAL mode (only a power loss can
+    drop the last commits).
+    """
+    if not readonly:
+        # Persistent in the database file; a read-only connection cannot switch it
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE:d}')
+    conn.execute(f'PRAGMA cache_size = {SQLITE_CACHE_SIZE:d}')
+    conn.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT:d}')
+    conn.execute('PRAGMA foreign_keys = ON')
+
 class Database:
     """Database connection manager supporting both PostgreSQL and SQLite"""
     
-    def __init__(self):
+    def __init__(self, readonly=False):
         self.db_type = DB_TYPE
+        self.readonly = readonly
         self.conn = None
         
     def connect(self):
@@ -24,15 +78,24 @@ class Database:
                 port=os.getenv('POSTGRES_PORT', '5433'),
                 database=os.getenv('POSTGRES_DB', 'tahoe_bear_jerky'),
                 user=os.getenv('POSTGRES_USER', 'postgres'),
-                password=os.getenv('POSTGRES_PASSWORD', '')
+                password=os.getenv('POSTGRES_PASSWORD', ''),
+                connection_factory=PreparingConnection
             )
             # Use RealDictCursor for dict-like row access
             self.conn.cursor_factory = psycopg2.extras.RealDictCursor
         else:
             # SQLite fallback
             db_path = os.getenv('SQLITE_DB_PATH', 'database/tahoe_bear_jerky.db')
-            self.conn = sqlite3.connect(db_path)
+            if self.readonly and sqlite_production():
+                target, uri = f'file:{os.path.abspath(db_path)}?mode=ro', True
+            else:
+                target, uri = db_path, False
+            # Pooled connections are handed to whichever thread borrows them
+            self.conn = sqlite3.connect(target, uri=uri, check_same_thread=False,
+                                        cached_statements=SQLITE_STATEMENT_CACHE_SIZE)
             self.conn.row_factory = sqlite3.Row
+            if sqlite_production():
+                apply_sqlite_pragmas(self.conn, readonly=self.readonly)
         
         return self.conn
     
@@ -62,13 +125,228 @@ class Database:
                 self.conn.rollback()
             self.close()
 
-def get_db_connection():
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool for PostgreSQL and SQLite
+
+    Connections are health checked when borrowed and recycled once they
+    are older than max_age seconds. The lock only guards the bookkeeping:
+    connecting, health checks and rollbacks run outside it, so a slow
+    database round trip does not stall other threads borrowing or
+    returning connections.
+    """
+
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 max_age=DB_POOL_MAX_AGE, timeout=DB_POOL_TIMEOUT, connect=None, name='main'):
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.name = name  # label for acquire-time metrics
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self._connect = connect or (lambda: Database().connect())
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, created_at), most recently used last
+        self._created_at = {}  # id(connection) -> created_at for every open connection
+        self._size = 0  # open connections plus slots reserved by threads still connecting
+        self._closed = False
+
+        for _ in range(self.min_size):
+            self._size += 1
+            conn = self._open()
+            self._idle.append((conn, self._created_at[id(conn)]))
+
+    def _open(self):
+        """Connect in a slot the caller has already reserved, giving it back on failure"""
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _forget(self, conn):
+        """Free a connection's slot; call with the lock held, then close it outside"""
+        self._created_at.pop(id(conn), None)
+        self._size -= 1
+        self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, created_at):
+        if self.max_age and time.monotonic() - created_at > self.max_age:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Borrow a healthy connection, opening a new one if the pool has room"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError('Connection pool is closed')
+                    if self._idle:
+                        conn, created_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f'No database connection available after {self.timeout}s')
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                return self._open()
+            if self._is_healthy(conn, created_at):
+                return conn
+            with self._cond:
+                self._forget(conn)
+            self._close(conn)
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        with self._cond:
+            if id(conn) not in self._created_at:
+                return
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            discard = discard or self._closed
+            if discard:
+                self._forget(conn)
+            else:
+                self._idle.append((conn, self._created_at[id(conn)]))
+                self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        start = time.perf_counter()
+        conn = self.acquire()
+        record_acquire(self.name, time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            # A connection that cannot roll back is broken and gets discarded
+            self.release(conn)
+
+    def stats(self):
+        """Current pool occupancy"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+            }
+
+    def close(self):
+        """Close all idle connections and refuse further borrowing"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for conn, _ in idle:
+                self._forget(conn)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+_pool = None
+_read_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(readonly=False):
+    """
+    Get the process-wide connection pool, creating it on first use
+    With the SQLite production profile, writes go through a pool holding
+    a single writer connection and readonly=True selects a separate pool
+    of read-only connections. Otherwise both share one pool.
+    """
+    global _pool, _read_pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if sqlite_production():
+                    # The writer is opened first so the database is in WAL mode before readers attach
+                    pool = ConnectionPool(min_size=1, max_size=1, name='write')
+                    _read_pool = ConnectionPool(connect=lambda: Database(readonly=True).connect(), name='read')
+                else:
+                    pool = _read_pool = ConnectionPool()
+                _pool = pool
+    return _read_pool if readonly else _pool
+
+def db_connection(readonly=False):
+    """
+    Borrow a pooled database connection
+    Pass readonly=True for queries that never write.
+
+    Usage:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            ...
+    """
+    return get_pool(readonly).connection()
+
+def is_retryable_error(error):
+    """True for serialization failures, deadlocks and SQLite lock contention"""
+    if isinstance(error, psycopg2.Error):
+        # serialization_failure, deadlock_detected
+        return error.pgcode in ('40001', '40P01')
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return 'locked' in message or 'busy' in message
+    return False
+
+def run_transaction(conn, work, retries=DB_TX_RETRIES, delay=DB_TX_RETRY_DELAY):
     """
-    Get a database connection
-    Returns a connection object that works with both PostgreSQL and SQLite
+    Run work(cursor) in a transaction and commit it
+    Retryable failures are rolled back and retried with exponential
+    backoff and jitter; anything else is rolled back and re-raised.
     """
-    db = Database()
-    return db.connect()
+    attempt = 0
+    while True:
+        cursor = conn.cursor()
+        try:
+            result = work(cursor)
+            conn.commit()
+            return result
+        except Exception as e:
+            conn.rollback()
+            if attempt >= retries or not is_retryable_error(e):
+                raise
+            time.sleep(delay * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
 
 def dict_from_row(row):
     """
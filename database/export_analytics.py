@@ -0,0 +1,170 @@
+"""
+Incremental export of order and inventory tables for analytics
+
+Usage:
+    python database/export_analytics.py [--output exports] [--format csv|parquet]
+                                        [--batch-size 50000] [--settle-seconds 60]
+                                        [--tables orders order_items ...]
+
+Each run picks up where the last one stopped: the highest exported id per
+table is kept in <output>/export_state.json, and only newer rows are read,
+in bounded id ranges, one chunk file per range:
+
+    exports/orders/orders-000000000001-000000050000.csv.gz
+
+CSV chunks are gzip-compressed and streamed with COPY ... TO STDOUT on
+PostgreSQL. Parquet needs pyarrow (pip install pyarrow).
+
+Rows younger than --settle-seconds are left for the next run, so a
+transaction that committed late with a lower id is not skipped. Rows are
+exported as inserted; later updates (e.g. order status) are not re-exported.
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from db_config import db_connection, DB_TYPE
+from queries import compile_sql
+from rows import tuple_cursor, iter_batches
+
+# Load environment variables
+load_dotenv()
+
+EXPORT_TABLES = ('orders', 'order_items', 'inventory_transactions')
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '50000'))
+EXPORT_SETTLE_SECONDS = int(os.getenv('EXPORT_SETTLE_SECONDS', '60'))
+STATE_FILE = 'export_state.json'
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+def settled_condition(settle_seconds):
+    """SQL condition for rows old enough to export"""
+    if DB_TYPE == 'postgresql':
+        return f"created_at < CURRENT_TIMESTAMP - INTERVAL '{int(settle_seconds)} seconds'"
+    return f"created_at < datetime('now', '-{int(settle_seconds)} seconds')"
+
+def load_state(output):
+    path = os.path.join(output, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(output, state):
+    """Write the high-water marks atomically"""
+    path = os.path.join(output, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def next_chunk_end(cursor, table, last_id, batch_size, settle_seconds):
+    """
+    Highest id in the next batch of settled rows after last_id, or None when caught up
+    The batch stops short of the first unsettled row so none is skipped.
+    """
+    settled = settled_condition(settle_seconds)
+    cursor.execute(compile_sql(f'''
+        SELECT MAX(id) AS max_id FROM (
+            SELECT id FROM {table}
+            WHERE id > ?
+              AND id < COALESCE((SELECT MIN(id) FROM {table} WHERE id > ? AND NOT ({settled})), ?)
+            ORDER BY id
+            LIMIT ?
+        ) chunk
+    '''), (last_id, last_id, 2 ** 62, batch_size))
+    # By name: conn.cursor() returns dict rows on PostgreSQL
+    return cursor.fetchone()['max_id']
+
+def write_csv_chunk(conn, table, first_id, last_id, path):
+    """Write rows first_id..last_id to a gzip CSV file with a header row; returns the row count"""
+    select = f'SELECT * FROM {table} WHERE id BETWEEN {int(first_id)} AND {int(last_id)} ORDER BY id'
+    with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+        if DB_TYPE == 'postgresql':
+            cursor = conn.cursor()
+            cursor.copy_expert(f'COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER true)', f)
+            return cursor.rowcount
+
+        cursor = tuple_cursor(conn)
+        cursor.execute(select)
+        writer = csv.writer(f)
+        writer.writerow([column[0] for column in cursor.description])
+        count = 0
+        for rows in iter_batches(cursor):
+            writer.writerows(rows)
+            count += len(rows)
+        return count
+
+def write_parquet_chunk(conn, table, first_id, last_id, path):
+    """Write rows first_id..last_id to a zstd-compressed Parquet file; returns the row count"""
+    cursor = tuple_cursor(conn)
+    cursor.execute(f'SELECT * FROM {table} WHERE id BETWEEN {int(first_id)} AND {int(last_id)} ORDER BY id')
+    columns = [column[0] for column in cursor.description]
+    # A chunk is at most --batch-size rows, so it is converted in one go and
+    # column types are inferred from the whole chunk
+    rows = cursor.fetchall()
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    pyarrow.parquet.write_table(pyarrow.table(dict(zip(columns, map(list, values)))),
+                                path, compression='zstd')
+    return len(rows)
+
+def export_table(table, output, fmt, batch_size, settle_seconds, state):
+    """Export every settled row newer than the table's high-water mark; returns rows written"""
+    table_dir = os.path.join(output, table)
+    os.makedirs(table_dir, exist_ok=True)
+    write_chunk = write_parquet_chunk if fmt == 'parquet' else write_csv_chunk
+    extension = 'parquet' if fmt == 'parquet' else 'csv.gz'
+
+    exported = 0
+    with db_connection(readonly=True) as conn:
+        while True:
+            last_id = state.get(table, {}).get('last_id', 0)
+            chunk_end = next_chunk_end(conn.cursor(), table, last_id, batch_size, settle_seconds)
+            if chunk_end is None:
+                break
+
+            path = os.path.join(table_dir, f'{table}-{last_id + 1:012d}-{chunk_end:012d}.{extension}')
+            count = write_chunk(conn, table, last_id + 1, chunk_end, path + '.tmp')
+            os.replace(path + '.tmp', path)
+            exported += count
+
+            # Only advance the mark once the chunk file is complete
+            state[table] = {'last_id': chunk_end,
+                            'exported_at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+            save_state(output, state)
+            print(f"  {table}: wrote {count:,} rows to {os.path.basename(path)}")
+            # End the read transaction between chunks so it does not pin old row versions
+            conn.rollback()
+    return exported
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental export of order and inventory tables')
+    parser.add_argument('--output', default=EXPORT_DIR)
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument('--settle-seconds', type=int, default=EXPORT_SETTLE_SECONDS)
+    parser.add_argument('--tables', nargs='+', choices=EXPORT_TABLES, default=list(EXPORT_TABLES))
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and pyarrow is None:
+        print("❌ Parquet export needs pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    os.makedirs(args.output, exist_ok=True)
+    state = load_state(args.output)
+    print(f"📦 Exporting {', '.join(args.tables)} to {args.output} as {args.format}")
+    for table in args.tables:
+        exported = export_table(table, args.output, args.format, args.batch_size,
+                                args.settle_seconds, state)
+        print(f"✓ {table}: {exported:,} new rows (high-water mark {state.get(table, {}).get('last_id', 0)})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+"""
+Request handling shared by api.py (Flask) and api_async.py (aiohttp)
+
+Query parsing and validation, response bodies and status codes, catalog
+encoding and ETags, order placement, gauges and the health report live
+here, so the two servers cannot drift apart. Each server only adapts its
+framework's requests and responses, and api_async.py keeps its own
+non-blocking reads. Invalid requests raise RequestError carrying the JSON
+body and status; other results are (body, status, headers) tuples or
+plain data. Everything here may block on the database.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from flask.json.provider import DefaultJSONProvider
+from db_config import db_connection, get_pool, run_transaction, dict_from_row, DB_TYPE, SQLITE_PROFILE
+from cache import catalog_cache, order_cache
+from catalog import fetch_product_page, decode_cursor, parse_fields, parse_limit, InvalidQueryError
+from inventory import OutOfStockError
+from queries import fetch_one, execute
+from rows import tuple_cursor, fetch_dicts, fetch_json
+from search import search_catalog, DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS
+from orders import place_order, generate_order_number, fetch_order
+from price_index import price_index, InvalidCartError
+from order_queue import OrderQueue, OrderQueueWorkers, ORDER_INTAKE_MODE
+from newsletter import MAX_EMAIL_LENGTH, newsletter_writer
+import metrics
+
+log = logging.getLogger(__name__)
+
+MAX_STATS_DAYS = 366
+MAX_STATS_LIMIT = 100
+DEFAULT_STATS_DAYS = 30
+DEFAULT_STATS_LIMIT = 10
+
+REQUIRED_ORDER_FIELDS = ('customer_email', 'items', 'shipping_address')
+
+# Optional async order intake: POST /api/orders returns 202 and workers write
+# the order. The servers start the workers.
+order_queue = None
+order_workers = None
+if ORDER_INTAKE_MODE == 'queued':
+    order_queue = OrderQueue()
+    order_workers = OrderQueueWorkers(order_queue)
+
+class RequestError(Exception):
+    """Raised for an invalid request; body is the JSON error response"""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': message, **details}
+
+
+# ============= JSON AND ETAGS =============
+
+# Flask's encoding of dates, decimals and UUIDs
+json_default = DefaultJSONProvider.default
+
+def dumps(data):
+    """JSON as Flask's app.json.dumps writes it"""
+    with metrics.timed('serialize'):
+        return json.dumps(data, default=json_default, sort_keys=True)
+
+def encode_catalog(data, headers=None):
+    """
+    Encode catalog data once, returning (body bytes, strong ETag, extra headers)
+    data may already be a JSON string, e.g. from rows.fetch_json.
+    """
+    if data is None:
+        return None
+    if not isinstance(data, str):
+        data = dumps(data)
+    body = (data + '\n').encode('utf-8')
+    headers = headers or {}
+    # Content only, so it survives cache invalidations that changed nothing
+    # (e.g. stock after a checkout) and matches across worker processes
+    digest = hashlib.sha1(body)
+    for name, value in sorted(headers.items()):
+        digest.update(f'\n{name}: {value}'.encode('utf-8'))
+    return body, digest.hexdigest()[:20], headers
+
+def encode_page(page):
+    """Encode a (rows, next_cursor) page, exposing the cursor as X-Next-Cursor"""
+    rows, next_cursor = page
+    return encode_catalog(rows, {'X-Next-Cursor': next_cursor} if next_cursor else None)
+
+def etag_matches(if_none_match, etag):
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+    return etag in tags or '*' in tags
+
+def catalog_reply(entry, if_none_match=''):
+    """
+    (body, status, headers) for a cached catalog entry from encode_catalog
+    A 304 without a body when If-None-Match still matches; clients always
+    revalidate with the ETag.
+    """
+    body, etag, headers = entry
+    headers = {**headers, 'Content-Type': 'application/json',
+               'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if etag_matches(if_none_match, etag):
+        return b'', 304, headers
+    return body, 200, headers
+
+# ============= CATALOG =============
+
+def load_catalog_version():
+    """Read the persisted catalog version bumped by bulk imports"""
+    with db_connection(readonly=True) as conn:
+        row = fetch_one(conn.cursor(), 'catalog_version')
+    return row['version'] if row else None
+
+def catalog_version_unavailable(error):
+    # Keep serving from the cache; the next poll tries again
+    log.warning(f'Could not read the catalog version: {error}')
+
+def sync_catalog_version():
+    """Drop cached catalog data and prices if another process imported a catalog"""
+    try:
+        catalog_cache.sync_version(load_catalog_version)
+    except Exception as e:
+        catalog_version_unavailable(e)
+
+def wants_stream(args):
+    """True when the client asked for a streamed response with ?stream=1"""
+    return args.get('stream') in ('1', 'true')
+
+def product_query(args):
+    """
+    (category, stream, after, limit, fields) from GET /api/products arguments
+    Supports keyset pagination (?limit=&cursor=) and projection (?fields=id,name,price);
+    ?stream=1 streams the whole listing instead of paginating it.
+    """
+    category = args.get('category')
+    if not category or category == 'all':
+        category = None
+    try:
+        if wants_stream(args):
+            if 'cursor' in args or 'limit' in args:
+                raise RequestError('stream cannot be combined with cursor or limit')
+            return category, True, None, None, parse_fields(args.get('fields'))
+        token = args.get('cursor')
+        after = decode_cursor(token) if token else None
+        limit = parse_limit(args.get('limit'), paginated=after is not None)
+        return category, False, after, limit, parse_fields(args.get('fields'))
+    except InvalidQueryError as e:
+        raise RequestError(str(e))
+
+def search_query(args):
+    """(query, limit) from GET /api/products/search arguments"""
+    query = args.get('q', '').strip()
+    if not query:
+        raise RequestError('Query parameter q is required')
+    try:
+        limit = int(args.get('limit', DEFAULT_SEARCH_RESULTS))
+    except ValueError:
+        raise RequestError('limit must be an integer')
+    return query, max(1, min(limit, MAX_SEARCH_RESULTS))
+
+def load_products(category=None, after=None, limit=None, fields=None):
+    """Query one page of active products, optionally limited to one category slug"""
+    with db_connection(readonly=True) as conn:
+        return fetch_product_page(tuple_cursor(conn), category, after, limit, fields,
+                                  as_json=True, json_default=json_default)
+
+def load_search_results(query, limit):
+    """Run a catalog search query"""
+    with db_connection(readonly=True) as conn:
+        return search_catalog(conn.cursor(), query, limit)
+
+def load_product(product_id):
+    """Query a single active product, or None if it does not exist"""
+    with db_connection(readonly=True) as conn:
+        product = fetch_one(conn.cursor(), 'product_by_id', (product_id,))
+    return dict_from_row(product) if product else None
+
+def load_categories():
+    """Query all categories in display order"""
+    with db_connection(readonly=True) as conn:
+        return fetch_json(execute(tuple_cursor(conn), 'categories'), default=json_default)
+
+def load_jerky_products():
+    """Query all active jerky products in display order"""
+    with db_connection(readonly=True) as conn:
+        return fetch_json(execute(tuple_cursor(conn), 'jerky_products'), default=json_default)
+
+def load_jerky_product(jerky_id):
+    """Query a single active jerky product, or None if it does not exist"""
+    with db_connection(readonly=True) as conn:
+        jerky_product = fetch_one(conn.cursor(), 'jerky_product_by_id', (jerky_id,))
+    return dict_from_row(jerky_product) if jerky_product else None
+
+# ============= ORDERS =============
+
+def create_order(data):
+    """
+    Validate, price and place (or queue) an order from a POST /api/orders body
+    Returns (body, status, headers). Callers sync the catalog version first.
+    """
+    if not isinstance(data, dict):
+        return {'error': 'Request body must be a JSON object'}, 400, None
+    if not all(field in data for field in REQUIRED_ORDER_FIELDS):
+        return {'error': 'Missing required fields'}, 400, None
+
+    # Prices and names come from the price index, never from the client
+    try:
+        cart = price_index.price_cart(data['items'])
+    except InvalidCartError as e:
+        return {'error': 'Invalid cart', 'details': e.errors}, 400, None
+
+    if order_workers:
+        # Queued mode: durably accept the order and let the workers write it
+        order_number = generate_order_number()
+        order_queue.enqueue(order_number, data, cart)
+        order_workers.notify()
+        return {
+            'success': True,
+            'order_number': order_number,
+            'status': 'queued',
+            'message': 'Order received and queued for processing'
+        }, 202, {'Location': f'/api/orders/{order_number}'}
+
+    with db_connection() as conn:
+        try:
+            # Stock is checked before any writes; contention is retried with backoff
+            order_id = run_transaction(conn, lambda cursor: place_order(cursor, data, cart))
+
+            # Stock quantities changed, so cached catalog reads are stale
+            catalog_cache.invalidate(stock_only=True)
+
+            order = dict_from_row(fetch_one(conn.cursor(), 'order_by_id', (order_id,)))
+            return {
+                'success': True,
+                'order': order,
+                'message': 'Order created successfully'
+            }, 201, None
+
+        except OutOfStockError as e:
+            return {'error': 'Insufficient stock', 'unavailable': e.shortages}, 409, None
+        except Exception as e:
+            return {'error': str(e)}, 500, None
+
+def queued_order(order_number):
+    """Intake status of a queued order that is not committed yet, or None"""
+    if not order_queue:
+        return None
+    queued = order_queue.status(order_number)
+    if not queued or queued['status'] == 'committed':
+        return None
+    return {
+        'order_number': order_number,
+        'intake_status': queued['status'],
+        'error': queued['error'],
+        'created_at': queued['created_at']
+    }
+
+def committed_order(order):
+    """Mark a stored order (or None) as committed for the order lookup response"""
+    if order:
+        order['intake_status'] = 'committed'
+    return order
+
+def load_order(order_number):
+    """Query an order with its customer and items in one round trip"""
+    with db_connection(readonly=True) as conn:
+        return committed_order(fetch_order(conn.cursor(), order_number))
+
+def order_lookup(order):
+    """(body, status) for GET /api/orders/<order_number>"""
+    if not order:
+        return {'error': 'Order not found'}, 404
+    return order, 200
+
+# ============= NEWSLETTER =============
+
+def newsletter_email(data):
+    """The email from a POST /api/newsletter/subscribe body"""
+    if not isinstance(data, dict):
+        raise RequestError('Request body must be a JSON object')
+    email = data.get('email')
+    if not email:
+        raise RequestError('Email is required')
+    if not isinstance(email, str) or len(email) > MAX_EMAIL_LENGTH:
+        raise RequestError('Invalid email')
+    return email
+
+def newsletter_reply(subscribed):
+    """(body, status) once the batch holding the email has committed"""
+    if subscribed:
+        return {'success': True, 'message': 'Successfully subscribed to newsletter'}, 201
+    return {'success': True, 'already_subscribed': True, 'message': 'Already subscribed to newsletter'}, 200
+
+# ============= STATS =============
+
+def parse_bounded_int(args, name, default, maximum):
+    """Read a positive integer query parameter no larger than maximum"""
+    try:
+        value = int(args.get(name, default))
+    except ValueError:
+        raise RequestError(f'{name} must be an integer')
+    if not 1 <= value <= maximum:
+        raise RequestError(f'{name} must be between 1 and {maximum}')
+    return value
+
+def stats_since(days):
+    """First date (UTC) of a window of days ending today"""
+    return datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+def daily_sales_query(args):
+    """(since,) for the last ?days= days"""
+    return (stats_since(parse_bounded_int(args, 'days', DEFAULT_STATS_DAYS, MAX_STATS_DAYS)),)
+
+def best_sellers_query(args):
+    """(since, limit) for the last ?days= days and ?limit= products"""
+    days = parse_bounded_int(args, 'days', DEFAULT_STATS_DAYS, MAX_STATS_DAYS)
+    limit = parse_bounded_int(args, 'limit', DEFAULT_STATS_LIMIT, MAX_STATS_LIMIT)
+    return stats_since(days), limit
+
+def load_stats(name, params=()):
+    """Rows of a stats query as dicts; dates are bound as ISO strings"""
+    params = tuple(value.isoformat() if hasattr(value, 'isoformat') else value for value in params)
+    with db_connection(readonly=True) as conn:
+        return fetch_dicts(execute(tuple_cursor(conn), name, params))
+
+# ============= METRICS AND HEALTH =============
+
+def pool_stats():
+    """{pool name: stats} of the blocking connection pools"""
+    return {pool.name: pool.stats() for pool in (get_pool(), get_pool(readonly=True))}
+
+def register_gauges(extra_pool_stats=None):
+    """Export pool and cache gauges; extra_pool_stats() adds pools of the server's own"""
+    def pool_gauges():
+        pools = pool_stats()
+        if extra_pool_stats:
+            pools.update(extra_pool_stats())
+        return {
+            (name, state): value
+            for name, stats in pools.items()
+            for state, value in stats.items()
+            if state != 'max_size'
+        }
+
+    def cache_gauges():
+        return {
+            (name, counter): cache.stats()[counter]
+            for name, cache in (('catalog', catalog_cache), ('order', order_cache))
+            for counter in ('hits', 'misses', 'size')
+        }
+
+    metrics.REGISTRY.register(metrics.Gauge(
+        'db_pool_connections', 'Pooled connections by state', ('pool', 'state'), pool_gauges))
+    metrics.REGISTRY.register(metrics.Gauge(
+        'cache_stats', 'Cache hits, misses and current size', ('cache', 'counter'), cache_gauges))
+
+def health(**extra):
+    """GET /api/health body; extra adds server-specific fields"""
+    pool, read_pool = get_pool(), get_pool(readonly=True)
+    return {
+        'status': 'healthy',
+        'database': DB_TYPE,
+        'sqlite_profile': SQLITE_PROFILE if DB_TYPE != 'postgresql' else None,
+        'pool': pool.stats(),
+        'read_pool': read_pool.stats() if read_pool is not pool else None,
+        'catalog_cache': catalog_cache.stats(),
+        'order_cache': order_cache.stats(),
+        'order_intake': ORDER_INTAKE_MODE,
+        'order_queue': order_queue.stats() if order_queue else None,
+        'newsletter_writer': newsletter_writer.stats(),
+        'metrics': metrics.summary(),
+        'timestamp': datetime.now().isoformat(),
+        **extra,
+    }
@@ -0,0 +1,360 @@
+"""
+Bulk catalog import: upsert categories, products and jerky products
+
+Usage:
+    python database/import_catalog.py catalog.json
+    python database/import_catalog.py products.csv --table products [--batch-size 1000] [--dry-run]
+
+A JSON file holds {"categories": [...], "products": [...], "jerky_products": [...]}
+(any subset), or a plain list of rows for --table. A CSV file has a header
+row and is always a single --table. Rows are matched on slug; products name
+their category by slug ("category") or id ("category_id").
+
+Incoming rows are compared with the stored ones in Python, so only new and
+changed rows are written, all in one transaction. When anything changed
+the catalog version is bumped and API processes drop their cached catalog
+data.
+
+Existing rows are only updated in the columns the input has, so a feed with
+just name, slug, category and price leaves descriptions, images and flags
+alone; an empty value clears an optional column. Defaults and the required
+columns only apply to new rows.
+
+stock_quantity only sets the opening stock of new products; stock on
+existing products is left to orders and inventory adjustments.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from dotenv import load_dotenv
+import psycopg2.extras
+from db_config import db_connection, run_transaction, DB_TYPE
+from queries import execute, fetch_one
+from rows import tuple_cursor
+
+# Load environment variables
+load_dotenv()
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+
+CENTS = Decimal('0.01')
+
+# columns maps column -> type; defaults apply to new rows; insert_only columns are never updated
+CatalogTable = namedtuple('CatalogTable', ['name', 'columns', 'required', 'defaults', 'insert_only'])
+
+# One validated input row: values in table column order, present the columns it set
+ImportRow = namedtuple('ImportRow', ['number', 'values', 'present'])
+
+CATALOG_TABLES = {
+    'categories': CatalogTable(
+        'categories',
+        {'name': str, 'slug': str, 'description': str, 'display_order': int},
+        ('name', 'slug'),
+        {'display_order': 0},
+        (),
+    ),
+    'products': CatalogTable(
+        'products',
+        {'name': str, 'slug': str, 'category_id': int, 'description': str, 'price': Decimal,
+         'image_url': str, 'emoji': str, 'stock_quantity': int, 'is_active': bool, 'featured': bool},
+        ('name', 'slug', 'category_id', 'price'),
+        {'stock_quantity': 0, 'is_active': True, 'featured': False},
+        ('stock_quantity',),
+    ),
+    'jerky_products': CatalogTable(
+        'jerky_products',
+        {'name': str, 'slug': str, 'title': str, 'description': str, 'price': Decimal,
+         'weight': str, 'image_url': str, 'status': str, 'badge_text': str, 'badge_color': str,
+         'display_order': int, 'is_active': bool},
+        ('name', 'slug', 'title', 'price'),
+        {'status': 'available', 'display_order': 0, 'is_active': True},
+        (),
+    ),
+}
+
+# Categories first so products can refer to them by slug
+IMPORT_ORDER = ('categories', 'products', 'jerky_products')
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+class CatalogImportError(Exception):
+    """Raised when import rows are malformed; nothing is written"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def convert(value, kind):
+    """Coerce a JSON or CSV value to the column's type; '' and None become None"""
+    if value is None or value == '':
+        return None
+    if kind is Decimal:
+        return Decimal(str(value)).quantize(CENTS)
+    if kind is bool:
+        if isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered not in TRUE_VALUES | FALSE_VALUES:
+                raise ValueError(f'not a boolean: {value!r}')
+            return lowered in TRUE_VALUES
+        return bool(value)
+    if kind is int:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(f'not an integer: {value!r}')
+        return int(value)
+    return str(value)
+
+def normalize_rows(table, rows, category_ids=None):
+    """
+    Validate and convert raw rows to ImportRows with values in table column order
+    Columns a row does not mention are None in values and left out of
+    present. Returns {slug: row}; raises CatalogImportError listing every bad row.
+    """
+    spec = CATALOG_TABLES[table]
+    errors = []
+    normalized = {}
+    for number, raw in enumerate(rows, start=1):
+        raw = dict(raw)
+        category = raw.pop('category', None)
+        if category_ids is not None and category not in (None, ''):
+            if category not in category_ids:
+                errors.append(f'{table} row {number}: unknown category {category!r}')
+                continue
+            raw['category_id'] = category_ids[category]
+
+        values = []
+        present = set()
+        for column, kind in spec.columns.items():
+            try:
+                value = convert(raw.get(column), kind)
+            except (ValueError, InvalidOperation) as e:
+                errors.append(f'{table} row {number}: {column} {e}')
+                break
+            if column in raw and value is None and column in spec.required:
+                errors.append(f'{table} row {number}: missing {column}')
+                break
+            # An empty value clears a nullable column; defaulted ones keep theirs
+            if column in raw and (value is not None or is_nullable(spec, column)):
+                present.add(column)
+            values.append(value)
+        else:
+            slug = values[list(spec.columns).index('slug')]
+            if slug is None:
+                errors.append(f'{table} row {number}: missing slug')
+            elif slug in normalized:
+                errors.append(f'{table} row {number}: duplicate slug {slug!r}')
+            else:
+                normalized[slug] = ImportRow(number, tuple(values), frozenset(present))
+
+    if errors:
+        raise CatalogImportError(errors)
+    return normalized
+
+def is_nullable(spec, column):
+    return column not in spec.required and column not in spec.defaults
+
+def stored_rows(cursor, table):
+    """Current rows of a catalog table as {slug: values} in table column order"""
+    spec = CATALOG_TABLES[table]
+    reader = tuple_cursor(cursor.connection)
+    reader.execute(f"SELECT {', '.join(spec.columns)} FROM {table}")
+    kinds = list(spec.columns.values())
+    slug_index = list(spec.columns).index('slug')
+    return {
+        row[slug_index]: tuple(convert(value, kind) for value, kind in zip(row, kinds))
+        for row in reader.fetchall()
+    }
+
+def classify(table, incoming, stored):
+    """
+    Split incoming rows into (new, changed, unchanged)
+    new rows are complete value tuples with defaults filled in. changed
+    maps a tuple of updated columns to [(values..., slug)]: only columns
+    present in the input are compared and written, so a partial feed
+    leaves the others alone. Raises CatalogImportError when a new row
+    lacks a required column.
+    """
+    spec = CATALOG_TABLES[table]
+    columns = list(spec.columns)
+    errors = []
+    new, changed, unchanged = [], {}, []
+    for slug, row in incoming.items():
+        current = stored.get(slug)
+        if current is None:
+            values = tuple(spec.defaults.get(column) if value is None else value
+                           for column, value in zip(columns, row.values))
+            missing = [column for column, value in zip(columns, values)
+                       if value is None and column in spec.required]
+            if missing:
+                errors.append(f"{table} row {row.number}: missing {', '.join(missing)}")
+            new.append(values)
+            continue
+        # Insert-only columns and the slug itself are never updated
+        updated = [index for index, column in enumerate(columns)
+                   if column in row.present and column != 'slug' and column not in spec.insert_only]
+        if any(row.values[index] != current[index] for index in updated):
+            key = tuple(columns[index] for index in updated)
+            changed.setdefault(key, []).append(tuple(row.values[index] for index in updated) + (slug,))
+        else:
+            unchanged.append(row)
+
+    if errors:
+        raise CatalogImportError(errors)
+    return new, changed, unchanged
+
+def upsert_sql(table, values):
+    """INSERT ... ON CONFLICT (slug) DO UPDATE for a catalog table with a VALUES slot"""
+    spec = CATALOG_TABLES[table]
+    updates = [f'{column} = excluded.{column}' for column in spec.columns
+               if column != 'slug' and column not in spec.insert_only]
+    return f'''
+        INSERT INTO {table} ({', '.join(spec.columns)})
+        VALUES {values}
+        ON CONFLICT (slug) DO UPDATE SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
+    '''
+
+def update_sql(table, columns, placeholder):
+    """UPDATE of the given columns of one row, matched on slug"""
+    updates = [f'{column} = {placeholder}' for column in columns]
+    return f'''
+        UPDATE {table} SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
+        WHERE slug = {placeholder}
+    '''
+
+def sqlite_rows(table, columns, rows):
+    """sqlite3 has no Decimal adapter; prices are stored as REAL"""
+    kinds = CATALOG_TABLES[table].columns
+    decimals = {index for index, column in enumerate(columns) if kinds.get(column) is Decimal}
+    if not decimals:
+        return rows
+    return [tuple(float(value) if index in decimals and value is not None else value
+                  for index, value in enumerate(row)) for row in rows]
+
+def write_rows(cursor, table, rows, batch_size):
+    """Upsert complete rows in batches of batch_size"""
+    if not rows:
+        return
+    if DB_TYPE == 'postgresql':
+        psycopg2.extras.execute_values(cursor, upsert_sql(table, '%s'), rows, page_size=batch_size)
+        return
+    columns = list(CATALOG_TABLES[table].columns)
+    sql = upsert_sql(table, '(' + ', '.join('?' * len(columns)) + ')')
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(sql, sqlite_rows(table, columns, rows[start:start + batch_size]))
+
+def update_rows(cursor, table, changed, batch_size):
+    """Write the changed columns of existing rows, one batch of statements per column set"""
+    for columns, rows in changed.items():
+        if DB_TYPE == 'postgresql':
+            psycopg2.extras.execute_batch(cursor, update_sql(table, columns, '%s'), rows,
+                                          page_size=batch_size)
+            continue
+        sql = update_sql(table, columns, '?')
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, sqlite_rows(table, columns, rows[start:start + batch_size]))
+
+def category_slugs(cursor):
+    reader = tuple_cursor(cursor.connection)
+    reader.execute('SELECT slug, id FROM categories')
+    return dict(reader.fetchall())
+
+def import_catalog(cursor, catalog, batch_size=IMPORT_BATCH_SIZE, update=True):
+    """
+    Upsert a catalog inside the caller's transaction
+    catalog maps table name -> list of row dicts. With update=False rows
+    that already exist are left alone and counted as skipped. Returns
+    ({table: {'inserted', 'updated', 'unchanged', 'skipped'}}, catalog version).
+    """
+    unknown = set(catalog) - set(CATALOG_TABLES)
+    if unknown:
+        raise CatalogImportError([f'unknown table {table!r}' for table in sorted(unknown)])
+
+    if DB_TYPE != 'postgresql' and not cursor.connection.in_transaction:
+        # Take the write lock up front so the comparison and the writes see the same rows
+        cursor.execute('BEGIN IMMEDIATE')
+
+    counts = {}
+    for table in IMPORT_ORDER:
+        if table not in catalog:
+            continue
+        if DB_TYPE == 'postgresql':
+            # Concurrent imports serialize instead of racing on the same slugs
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        category_ids = category_slugs(cursor) if table == 'products' else None
+        incoming = normalize_rows(table, catalog[table], category_ids)
+        new, changed, unchanged = classify(table, incoming, stored_rows(cursor, table))
+        write_rows(cursor, table, new, batch_size)
+        if update:
+            update_rows(cursor, table, changed, batch_size)
+        changed_count = sum(len(rows) for rows in changed.values())
+        counts[table] = {
+            'inserted': len(new),
+            'updated': changed_count if update else 0,
+            'unchanged': len(unchanged),
+            'skipped': 0 if update else changed_count,
+        }
+
+    if any(table_counts['inserted'] or table_counts['updated'] for table_counts in counts.values()):
+        execute(cursor, 'bump_catalog_version')
+    row = fetch_one(cursor, 'catalog_version')
+    return counts, row['version'] if row else None
+
+def read_catalog_file(path, table=None):
+    """Load a .json or .csv file as {table: rows}"""
+    if path.endswith('.csv'):
+        if table is None:
+            raise CatalogImportError([f'{path}: CSV files need --table'])
+        with open(path, newline='', encoding='utf-8') as f:
+            return {table: list(csv.DictReader(f))}
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        if table is None:
+            raise CatalogImportError([f'{path}: a list of rows needs --table'])
+        return {table: data}
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk upsert categories, products and jerky products')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--table', choices=IMPORT_ORDER)
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='report the counts and roll back')
+    args = parser.parse_args()
+
+    catalog = {}
+    try:
+        for path in args.files:
+            for table, rows in read_catalog_file(path, args.table).items():
+                catalog.setdefault(table, []).extend(rows)
+
+        print(f"📦 Importing {', '.join(f'{len(rows):,} {table}' for table, rows in catalog.items())}")
+        with db_connection() as conn:
+            if args.dry_run:
+                counts, version = import_catalog(conn.cursor(), catalog, args.batch_size)
+                conn.rollback()
+            else:
+                counts, version = run_transaction(
+                    conn, lambda cursor: import_catalog(cursor, catalog, args.batch_size))
+    except CatalogImportError as e:
+        for error in e.errors:
+            print(f"  {error}")
+        print(f"❌ Import failed with {len(e.errors)} errors; nothing was written")
+        sys.exit(1)
+
+    for table, table_counts in counts.items():
+        print(f"✓ {table}: {table_counts['inserted']:,} inserted, {table_counts['updated']:,} updated, "
+              f"{table_counts['unchanged']:,} unchanged")
+    if args.dry_run:
+        print("✓ Dry run: rolled back")
+    else:
+        print(f"✓ Catalog version {version}")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
-import os
 import sys
 from dotenv import load_dotenv
 from db_config import Database, DB_TYPE
+from import_catalog import import_catalog
+from migrate import migrate
 
 # Load environment variables
 load_dotenv()
@@ -9,37 +10,18 @@ load_dotenv()
 def init_database():
     """Initialize the database with schema and seed data"""
     
-    # Determine which schema file to use
     if DB_TYPE == 'postgresql':
-        schema_file = 'schema_postgres.sql'
         print(f"🐘 Using PostgreSQL database")
     else:
-        schema_file = 'schema.sql'
         print(f"📁 Using SQLite database")
     
-    # Read schema file
-    schema_path = os.path.join(os.path.dirname(__file__), schema_file)
-    
-    if not os.path.exists(schema_path):
-        print(f"❌ Schema file not found: {schema_path}")
-        return
-    
-    with open(schema_path, 'r') as f:
-        schema_sql = f.read()
-    
     # Connect to database
     with Database() as db:
-        cursor = db.get_cursor()
-        
-        # Execute schema
-        if DB_TYPE == 'postgresql':
-            # PostgreSQL can execute the entire script at once
-            cursor.execute(schema_sql)
-        else:
-            # SQLite needs executescript
-            cursor.executescript(schema_sql)
+        # Baseline schema plus every pending migration
+        applied = migrate(db.conn)
+        print(f"✓ Database schema up to date ({len(applied)} migrations applied)")
         
-        print("✓ Database schema created successfully")
+        cursor = db.get_cursor()
         
         # Seed categories
         categories = [
@@ -49,24 +31,6 @@ def init_database():
             ('Stickers', 'stickers', 'Weatherproof vinyl stickers', 4),
         ]
         
-        for cat in categories:
-            try:
-                if DB_TYPE == 'postgresql':
-                    cursor.execute('''
-                        INSERT INTO categories (name, slug, description, display_order)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (slug) DO NOTHING
-                    ''', cat)
-                else:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO categories (name, slug, description, display_order)
-                        VALUES (?, ?, ?, ?)
-                    ''', cat)
-            except Exception as e:
-                print(f"Warning: Could not insert category {cat[0]}: {e}")
-        
-        print(f"✓ Inserted {len(categories)} categories")
-        
         # Seed products
         products = [
             # T-Shirts
@@ -102,26 +66,6 @@ def init_database():
              4.99, None, '🏔️', 150, True, False),
         ]
         
-        for prod in products:
-            try:
-                if DB_TYPE == 'postgresql':
-                    cursor.execute('''
-                        INSERT INTO products 
-                        (name, slug, category_id, description, price, image_url, emoji, stock_quantity, is_active, featured)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (slug) DO NOTHING
-                    ''', prod)
-                else:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO products 
-                        (name, slug, category_id, description, price, image_url, emoji, stock_quantity, is_active, featured)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', prod)
-            except Exception as e:
-                print(f"Warning: Could not insert product {prod[0]}: {e}")
-        
-        print(f"✓ Inserted {len(products)} products")
-        
         # Seed jerky products (parody items)
         jerky_products = [
             ('Premium Bear Jerky', 'premium-bear-jerky', 'Premium Bear Jerky',
@@ -135,25 +79,27 @@ def init_database():
              35.00, '6oz', 'https://tahoebearjerky.com/coyote_with_sign.png', 'seasonal', 'SEASONAL', None, 3, True),
         ]
         
-        for jerky in jerky_products:
-            try:
-                if DB_TYPE == 'postgresql':
-                    cursor.execute('''
-                        INSERT INTO jerky_products 
-                        (name, slug, title, description, price, weight, image_url, status, badge_text, badge_color, display_order, is_active)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (slug) DO NOTHING
-                    ''', jerky)
-                else:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO jerky_products 
-                        (name, slug, title, description, price, weight, image_url, status, badge_text, badge_color, display_order, is_active)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', jerky)
-            except Exception as e:
-                print(f"Warning: Could not insert jerky product {jerky[0]}: {e}")
+        # Seed rows that already exist are left as they are
+        counts, _ = import_catalog(cursor, {
+            'categories': [
+                dict(zip(('name', 'slug', 'description', 'display_order'), cat))
+                for cat in categories
+            ],
+            'products': [
+                dict(zip(('name', 'slug', 'category_id', 'description', 'price', 'image_url',
+                          'emoji', 'stock_quantity', 'is_active', 'featured'), prod))
+                for prod in products
+            ],
+            'jerky_products': [
+                dict(zip(('name', 'slug', 'title', 'description', 'price', 'weight', 'image_url',
+                          'status', 'badge_text', 'badge_color', 'display_order', 'is_active'), jerky))
+                for jerky in jerky_products
+            ],
+        }, update=False)
         
-        print(f"✓ Inserted {len(jerky_products)} jerky products")
+        print(f"✓ Inserted {counts['categories']['inserted']} categories")
+        print(f"✓ Inserted {counts['products']['inserted']} products")
+        print(f"✓ Inserted {counts['jerky_products']['inserted']} jerky products")
         
         # Get database info
         if DB_TYPE == 'postgresql':
@@ -187,7 +133,12 @@ def reset_database():
             'customers',
             'products',
             'categories',
-            'jerky_products'
+            'jerky_products',
+            'daily_product_sales',
+            'product_stock_movement',
+            'catalog_version',
+            'catalog_search',
+            'schema_migrations'
         ]
         
         for table in tables:
@@ -0,0 +1,92 @@
+import psycopg2.extras
+from db_config import DB_TYPE
+from queries import placeholders
+import metrics
+
+class OutOfStockError(Exception):
+    """Raised when a cart asks for more units than are in stock"""
+
+    def __init__(self, shortages):
+        super().__init__('Insufficient stock for ' + ', '.join(
+            f"product {s['product_id']}" for s in shortages))
+        self.shortages = shortages  # [{'product_id', 'requested', 'available'}]
+
+
+def begin_stock_transaction(cursor):
+    """
+    Start the write transaction for a checkout
+    SQLite takes the write lock up front so the stock check and the
+    decrement cannot interleave with another writer.
+    """
+    if DB_TYPE != 'postgresql' and not cursor.connection.in_transaction:
+        cursor.execute('BEGIN IMMEDIATE')
+
+def lock_and_check_stock(cursor, quantities):
+    """
+    Lock the cart's product rows in id order and verify availability
+    Raises OutOfStockError before anything has been written.
+    quantities maps product id -> requested units.
+    """
+    product_ids = sorted(quantities)
+    if not product_ids:
+        return
+
+    with metrics.query('lock_stock'):
+        if DB_TYPE == 'postgresql':
+            # Locking in a deterministic order keeps concurrent checkouts deadlock-free
+            cursor.execute('''
+                SELECT id, stock_quantity FROM products
+                WHERE id IN %s
+                ORDER BY id
+                FOR UPDATE
+            ''', (tuple(product_ids),))
+        else:
+            cursor.execute(f'''
+                SELECT id, stock_quantity FROM products
+                WHERE id IN ({placeholders(len(product_ids))})
+                ORDER BY id
+            ''', product_ids)
+
+    available = {row['id']: row['stock_quantity'] or 0 for row in metrics.timed_fetch(cursor.fetchall)}
+    shortages = [
+        {'product_id': product_id, 'requested': quantities[product_id],
+         'available': available.get(product_id, 0)}
+        for product_id in product_ids
+        if quantities[product_id] > available.get(product_id, 0)
+    ]
+    if shortages:
+        raise OutOfStockError(shortages)
+
+def reserve_stock(cursor, quantities):
+    """
+    Decrement stock for every product in one conditional UPDATE
+    Rows without enough stock are left untouched; if any product misses,
+    OutOfStockError is raised and the caller must roll back.
+    """
+    rows = sorted(quantities.items())
+    if not rows:
+        return
+
+    with metrics.query('reserve_stock'):
+        if DB_TYPE == 'postgresql':
+            updated = psycopg2.extras.execute_values(cursor, '''
+                UPDATE products AS p SET stock_quantity = p.stock_quantity - v.quantity
+                FROM (VALUES %s) AS v (id, quantity)
+                WHERE p.id = v.id AND p.stock_quantity >= v.quantity
+                RETURNING p.id
+            ''', rows, fetch=True)
+            updated_count = len(updated)
+        else:
+            values = ', '.join(['(?, ?)'] * len(rows))
+            cursor.execute(f'''
+                UPDATE products SET stock_quantity = stock_quantity - v.column2
+                FROM (VALUES {values}) AS v
+                WHERE products.id = v.column1 AND products.stock_quantity >= v.column2
+            ''', [value for row in rows for value in row])
+            updated_count = cursor.rowcount
+        metrics.record_rows(updated_count)
+
+    if updated_count != len(rows):
+        # Re-read to report which products fell short
+        lock_and_check_stock(cursor, quantities)
+        raise RuntimeError('Stock reservation updated fewer products than requested')
@@ -0,0 +1,306 @@
+"""
+In-process request and query metrics, exposed in Prometheus text format
+
+The API opens a RequestMetrics per request (start_request/finish_request).
+While it is open, pool acquires, queries, row fetches, row conversion and
+JSON serialization add their time to it; when the request finishes its
+totals feed the histograms below, and queries slower than SLOW_QUERY_MS
+are logged. Outside a request (CLIs, background workers) queries are
+recorded as soon as they execute.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Queries at least this slow (execute plus fetch) are logged; 0 logs every query
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger('slow_queries')
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, le=None):
+    pairs = [f'{name}="{_label_value(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _value(value):
+    """Sample value in exposition format; whole numbers exactly, not rounded to 6 digits"""
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labels, key)} {_value(value)}' for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = []
+        for key, values in series:
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, f"{bound:g}")} {count}')
+            lines.append(f'{self.name}_bucket{_labels(self.labels, key, "+Inf")} {values[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {values[-2]:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {values[-1]}')
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time; read() returns {label values: value}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels, read):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.read = read
+
+    def samples(self):
+        return [f'{self.name}{_labels(self.labels, key)} {_value(value)}'
+                for key, value in sorted(self.read().items())]
+
+
+class Registry:
+    """Ordered set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status')))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Total handler time per route, including streaming',
+    ('method', 'route')))
+HTTP_PHASE = REGISTRY.register(Histogram(
+    'http_request_phase_seconds', 'Time per request spent acquiring connections, querying, '
+    'converting rows and serializing JSON', ('route', 'phase')))
+POOL_ACQUIRE = REGISTRY.register(Histogram(
+    'db_pool_acquire_seconds', 'Time waiting to borrow a pooled connection', ('pool',)))
+QUERY_DURATION = REGISTRY.register(Histogram(
+    'db_query_duration_seconds', 'Query execute plus fetch time', ('query',)))
+QUERY_ROWS = REGISTRY.register(Counter(
+    'db_query_rows_total', 'Rows fetched or affected per query', ('query',)))
+SLOW_QUERIES = REGISTRY.register(Counter(
+    'db_slow_queries_total', 'Queries slower than SLOW_QUERY_MS', ('query',)))
+
+PHASES = ('acquire', 'query', 'convert', 'serialize')
+
+class QueryRecord:
+    __slots__ = ('name', 'seconds', 'rows', 'closed')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.closed = False
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled"""
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.status = None
+        self.started = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = []
+
+
+_current_request = ContextVar('current_request', default=None)
+_last_query = ContextVar('last_query', default=None)
+
+def start_request(method, route):
+    """Begin collecting metrics for the request handled in this context"""
+    request_metrics = RequestMetrics(method, route)
+    _current_request.set(request_metrics)
+    _last_query.set(None)
+    return request_metrics
+
+def finish_request(request_metrics, status=None):
+    """Record a finished request's totals and its queries"""
+    if _current_request.get() is request_metrics:
+        _current_request.set(None)
+        _last_query.set(None)
+    elapsed = time.perf_counter() - request_metrics.started
+    status = status or request_metrics.status or 500
+    HTTP_REQUESTS.inc(method=request_metrics.method, route=request_metrics.route, status=status)
+    HTTP_DURATION.observe(elapsed, method=request_metrics.method, route=request_metrics.route)
+    for phase, seconds in request_metrics.phases.items():
+        HTTP_PHASE.observe(seconds, route=request_metrics.route, phase=phase)
+    for record in request_metrics.queries:
+        _close_query(record, request_metrics.route)
+
+def _close_query(record, route=None):
+    record.closed = True
+    QUERY_DURATION.observe(record.seconds, query=record.name)
+    QUERY_ROWS.inc(record.rows, query=record.name)
+    if record.seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(query=record.name)
+        slow_query_log.warning('slow query %s: %.1f ms, %d rows%s', record.name, record.seconds * 1000,
+                               record.rows, f' ({route})' if route else '')
+
+@contextmanager
+def timed(phase):
+    """Add the block's duration to a phase of the current request"""
+    request_metrics = _current_request.get()
+    if request_metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics.phases[phase] += time.perf_counter() - start
+
+@contextmanager
+def query(name):
+    """
+    Time a query's execute; later fetches add to the same record
+    Row counts of writes come from cursor.rowcount via record_rows.
+    """
+    record = QueryRecord(name)
+    request_metrics = _current_request.get()
+    _last_query.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        elapsed = time.perf_counter() - start
+        record.seconds += elapsed
+        if request_metrics is not None:
+            request_metrics.phases['query'] += elapsed
+            request_metrics.queries.append(record)
+        else:
+            _close_query(record)
+
+def record_rows(count):
+    """Add rows fetched or affected to the most recent query"""
+    record = _last_query.get()
+    if record is None or count <= 0:
+        return
+    if record.closed:
+        QUERY_ROWS.inc(count, query=record.name)
+    else:
+        record.rows += count
+
+def timed_fetch(fetch, *args):
+    """
+    Call a cursor fetch method, adding its time and row count to the most recent query
+    SQLite computes rows as they are fetched, so this is part of the query's cost.
+    """
+    start = time.perf_counter()
+    result = fetch(*args)
+    elapsed = time.perf_counter() - start
+    record = _last_query.get()
+    if record is not None and not record.closed:
+        record.seconds += elapsed
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        request_metrics.phases['query'] += elapsed
+    record_rows(len(result) if isinstance(result, list) else int(result is not None))
+    return result
+
+def record_acquire(pool, seconds):
+    """Record the wait to borrow a connection from a pool"""
+    POOL_ACQUIRE.observe(seconds, pool=pool)
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        request_metrics.phases['acquire'] += seconds
+
+def summary():
+    """Request and slow-query totals for the health check"""
+    return {
+        'requests': int(HTTP_REQUESTS.total()),
+        'slow_queries': int(SLOW_QUERIES.total()),
+        'slow_query_ms': SLOW_QUERY_MS,
+    }
@@ -0,0 +1,182 @@
+"""
+Versioned schema migrations for SQLite and PostgreSQL
+
+Usage:
+    python database/migrate.py           # apply pending migrations
+    python database/migrate.py status    # list applied and pending migrations
+
+Migration 1 is the baseline: schema.sql / schema_postgres.sql, which only
+use IF NOT EXISTS, so applying it to a database created before migrations
+existed fills in whatever that database is missing. Those files are frozen;
+later changes go in database/migrations/ as
+
+    0002_performance_indexes.sql             # both backends
+    0003_something.sqlite.sql                # SQLite only
+    0003_something.postgresql.sql            # PostgreSQL only
+
+Applied versions are recorded in schema_migrations. Each migration runs in
+its own transaction, except PostgreSQL files starting with the line
+
+    -- migrate: no-transaction
+
+which run statement by statement in autocommit mode, as
+CREATE INDEX CONCURRENTLY requires. Such files must be safe to re-run.
+"""
+import os
+import re
+import sys
+from collections import namedtuple
+from db_config import Database, DB_TYPE
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+BASELINE_FILES = {
+    'postgresql': os.path.join(os.path.dirname(__file__), 'schema_postgres.sql'),
+    'sqlite': os.path.join(os.path.dirname(__file__), 'schema.sql'),
+}
+NO_TRANSACTION = '-- migrate: no-transaction'
+# Held while migrating so two deploys do not apply the same migration twice
+ADVISORY_LOCK_ID = 7_264_001
+
+Migration = namedtuple('Migration', ['version', 'name', 'path'])
+
+FILE_PATTERN = re.compile(r'^(\d+)_(\w+?)(?:\.(sqlite|postgresql))?\.sql$')
+CONCURRENT_INDEX = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)',
+                              re.IGNORECASE)
+
+def backend():
+    return 'postgresql' if DB_TYPE == 'postgresql' else 'sqlite'
+
+def find_migrations(directory=MIGRATIONS_DIR):
+    """Migrations for the current backend in version order, starting with the baseline"""
+    migrations = {1: Migration(1, 'baseline', BASELINE_FILES[backend()])}
+    for filename in sorted(os.listdir(directory)):
+        match = FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        version, name, target = int(match.group(1)), match.group(2), match.group(3)
+        if target not in (None, backend()):
+            continue
+        if version == 1:
+            raise ValueError(f'Version 1 is the baseline schema: {filename}')
+        if version in migrations:
+            raise ValueError(f'Duplicate migration version {version}: {filename}')
+        migrations[version] = Migration(version, name, os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+def ensure_migrations_table(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+def applied_versions(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM schema_migrations')
+    versions = {row['version'] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+def split_statements(sql):
+    """Split a no-transaction file on semicolons that end a line"""
+    sql = '\n'.join(line for line in sql.splitlines() if not line.strip().startswith('--'))
+    return [statement.strip() for statement in re.split(r';\s*$', sql, flags=re.MULTILINE)
+            if statement.strip()]
+
+def drop_invalid_indexes(cursor, sql):
+    """
+    Drop indexes a failed CREATE INDEX CONCURRENTLY left INVALID
+    IF NOT EXISTS would otherwise skip them and leave them unusable.
+    """
+    for name in CONCURRENT_INDEX.findall(sql):
+        cursor.execute('''
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND NOT i.indisvalid
+        ''', (name,))
+        if cursor.fetchone():
+            print(f"  Dropping invalid index {name} left by an interrupted build")
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+def record(cursor, migration):
+    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
+    cursor.execute(f'INSERT INTO schema_migrations (version, name) VALUES ({placeholder}, {placeholder})',
+                   (migration.version, migration.name))
+
+def apply_migration(conn, migration):
+    with open(migration.path) as f:
+        sql = f.read()
+
+    if DB_TYPE == 'postgresql' and sql.lstrip().startswith(NO_TRANSACTION):
+        conn.autocommit = True
+        try:
+            cursor = conn.cursor()
+            drop_invalid_indexes(cursor, sql)
+            for statement in split_statements(sql):
+                cursor.execute(statement)
+            record(cursor, migration)
+        finally:
+            conn.autocommit = False
+        return
+
+    try:
+        if DB_TYPE == 'postgresql':
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            record(cursor, migration)
+            conn.commit()
+        else:
+            # executescript commits first, so the transaction is opened in the script
+            conn.executescript(f'BEGIN;\n{sql}\n;\n'
+                               f"INSERT INTO schema_migrations (version, name) "
+                               f"VALUES ({migration.version}, '{migration.name}');\nCOMMIT;")
+    except Exception:
+        conn.rollback()
+        raise
+
+def migrate(conn, migrations=None):
+    """Apply every pending migration in order; returns the ones applied"""
+    migrations = find_migrations() if migrations is None else migrations
+    ensure_migrations_table(conn)
+    if DB_TYPE == 'postgresql':
+        conn.autocommit = True
+        conn.cursor().execute('SELECT pg_advisory_lock(%s)', (ADVISORY_LOCK_ID,))
+        conn.autocommit = False
+    try:
+        applied = applied_versions(conn)
+        pending = [migration for migration in migrations if migration.version not in applied]
+        for migration in pending:
+            print(f"  Applying {migration.version:04d}_{migration.name}")
+            apply_migration(conn, migration)
+        return pending
+    finally:
+        if DB_TYPE == 'postgresql':
+            conn.autocommit = True
+            conn.cursor().execute('SELECT pg_advisory_unlock(%s)', (ADVISORY_LOCK_ID,))
+            conn.autocommit = False
+
+def status(conn):
+    ensure_migrations_table(conn)
+    applied = applied_versions(conn)
+    migrations = find_migrations()
+    for migration in migrations:
+        mark = '✓' if migration.version in applied else ' '
+        print(f"  [{mark}] {migration.version:04d}_{migration.name}")
+    print(f"{sum(migration.version not in applied for migration in migrations)} pending")
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'up'
+    with Database() as db:
+        if command == 'up':
+            print(f"🗂️  Migrating {backend()} database")
+            applied = migrate(db.conn)
+            print(f"✓ Applied {len(applied)} migrations" if applied else "✓ Already up to date")
+        elif command == 'status':
+            status(db.conn)
+        else:
+            print(f"Unknown command: {command} (expected up or status)")
+            sys.exit(2)
@@ -0,0 +1,12 @@
+-- orders.order_number, customers.email and newsletter_subscribers.email are
+-- UNIQUE, so their lookups already use the implicit unique indexes.
+
+-- Active jerky products in display order (GET /api/jerky-products)
+CREATE INDEX IF NOT EXISTS idx_jerky_products_listing ON jerky_products(is_active, display_order);
+DROP INDEX IF EXISTS idx_jerky_products_active;
+
+-- Stock history per product (rollups rebuild/check, inventory audits)
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_product ON inventory_transactions(product_id, created_at);
+
+-- Categories in display order (GET /api/categories)
+CREATE INDEX IF NOT EXISTS idx_categories_display_order ON categories(display_order);
@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- Checkout reuses a customer's address when the same one is entered again:
+-- orders.address_fingerprint() hashes the normalized fields, and the unique
+-- index lets the insert skip rows that already exist.
+-- Addresses saved before this migration keep a NULL fingerprint (NULLs never
+-- conflict), so a returning customer gets one new fingerprinted row at most.
+ALTER TABLE addresses ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+
+-- Built CONCURRENTLY so checkouts are not blocked while it builds
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_addresses_customer_fingerprint ON addresses(customer_id, fingerprint);
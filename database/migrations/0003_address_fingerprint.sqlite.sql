@@ -0,0 +1,8 @@
+-- Checkout reuses a customer's address when the same one is entered again:
+-- orders.address_fingerprint() hashes the normalized fields, and the unique
+-- index lets the insert skip rows that already exist.
+-- Addresses saved before this migration keep a NULL fingerprint (NULLs never
+-- conflict), so a returning customer gets one new fingerprinted row at most.
+ALTER TABLE addresses ADD COLUMN fingerprint VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_addresses_customer_fingerprint ON addresses(customer_id, fingerprint);
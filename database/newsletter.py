@@ -0,0 +1,126 @@
+"""
+Coalesced newsletter subscription writes
+
+During an email blast every request used to run its own INSERT and
+commit, so on SQLite each one waited for the write lock in turn. Here
+requests hand their email to a single writer thread that gathers
+subscriptions for up to NEWSLETTER_BATCH_WAIT_MS (or NEWSLETTER_BATCH_SIZE
+emails), inserts them with one statement and commits. Each caller's future
+resolves after that commit: True for a new subscriber, False if the email
+was already subscribed (including by an earlier request in the same batch).
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from db_config import db_connection, run_transaction
+from queries import compile_sql
+import metrics
+
+# Load environment variables
+load_dotenv()
+
+NEWSLETTER_BATCH_SIZE = int(os.getenv('NEWSLETTER_BATCH_SIZE', '200'))
+NEWSLETTER_BATCH_WAIT_MS = float(os.getenv('NEWSLETTER_BATCH_WAIT_MS', '5'))
+
+# newsletter_subscribers.email is VARCHAR(255); a longer one would fail the whole batch on PostgreSQL
+MAX_EMAIL_LENGTH = 255
+
+def insert_subscribers(cursor, emails):
+    """Insert distinct emails in one statement; returns the set that were not subscribed yet"""
+    values = ', '.join(['(?)'] * len(emails))
+    with metrics.query('subscribe_newsletter'):
+        cursor.execute(compile_sql(f'''
+            INSERT INTO newsletter_subscribers (email)
+            VALUES {values}
+            ON CONFLICT (email) DO NOTHING
+            RETURNING email
+        '''), emails)
+        rows = cursor.fetchall()
+        metrics.record_rows(len(rows))
+    return {row['email'] for row in rows}
+
+class SubscriptionBatcher:
+    """Collects subscriptions from many threads and writes them in batches"""
+
+    def __init__(self, batch_size=NEWSLETTER_BATCH_SIZE, max_wait=NEWSLETTER_BATCH_WAIT_MS / 1000):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.subscriptions = 0
+        self._pending = []  # (email, future) in arrival order
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._thread = None
+
+    def subscribe(self, email):
+        """Queue an email; returns a Future resolving to True if it is a new subscriber"""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='newsletter-writer', daemon=True)
+                self._thread.start()
+            self._pending.append((email, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._ready.notify()
+        return future
+
+    def _take_batch(self):
+        with self._lock:
+            while not self._pending:
+                self._ready.wait()
+            # Give concurrent requests a moment to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            return batch
+
+    def flush(self, batch):
+        """Write one batch and resolve its futures"""
+        # Duplicates in the batch are written once; the first caller gets the new subscription
+        first = OrderedDict()
+        for index, (email, _) in enumerate(batch):
+            first.setdefault(email, index)
+        emails = list(first)
+        try:
+            with db_connection() as conn:
+                inserted = run_transaction(conn, lambda cursor: insert_subscribers(cursor, emails))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.subscriptions += len(batch)
+        for index, (email, future) in enumerate(batch):
+            future.set_result(email in inserted and first[email] == index)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self.flush(batch)
+            except Exception as e:
+                print(f"Warning: newsletter writer error: {e}", file=sys.stderr)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'batches': self.batches,
+            'subscriptions': self.subscriptions,
+            'batch_size': self.batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+newsletter_writer = SubscriptionBatcher()
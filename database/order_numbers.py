@@ -0,0 +1,95 @@
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Crockford base32: no I, L, O or U, and ASCII order matches numeric order
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+TIME_CHARS = 9            # 45 bits of milliseconds, good for ~1100 years
+SEQUENCE_CHARS = 3        # 15 bits: 32768 numbers per millisecond per process
+NODE_CHARS = 6            # 30 bits, random per process unless configured
+MAX_SEQUENCE = 32 ** SEQUENCE_CHARS - 1
+MAX_NODE = 32 ** NODE_CHARS - 1
+
+def encode_base32(value, width):
+    """Fixed-width Crockford base32 encoding of a non-negative integer"""
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+def default_node_id():
+    """
+    Node id for this process
+    ORDER_NUMBER_NODE_ID overrides it; otherwise it is 30 random bits. The
+    pid is no help across hosts: containers of one image all run the server
+    under the same pid.
+    """
+    configured = os.getenv('ORDER_NUMBER_NODE_ID')
+    if configured:
+        node_id = int(configured)
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f'ORDER_NUMBER_NODE_ID must be between 0 and {MAX_NODE}')
+        return node_id
+    return secrets.randbits(30)
+
+class OrderNumberGenerator:
+    """
+    Time-ordered order numbers: TBJ-YYYYMMDD-<time><sequence><node>
+
+    Numbers from one process are strictly increasing, even if the clock
+    steps backwards, and numbers from different processes sort by creation
+    time, so inserts land at the end of the orders.order_number index.
+    The node id is part of every number, so two processes only collide if
+    they share a node id and a millisecond. Random ids make that unlikely
+    (about n^2 / 2^31 for n processes); set a distinct ORDER_NUMBER_NODE_ID
+    per process where it must be ruled out.
+    """
+
+    def __init__(self, prefix='TBJ', node_id=None):
+        self.prefix = prefix
+        self._node_id = node_id
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.node_id = self._node_id if self._node_id is not None else default_node_id()
+        self._node = encode_base32(self.node_id, NODE_CHARS)
+        self._last_ms = 0
+        self._sequence = 0
+
+    def _next_tick(self):
+        now = int(time.time() * 1000) - EPOCH_MS
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                # Same millisecond, or the clock stepped back
+                self._sequence += 1
+            else:
+                # Sequence exhausted: borrow the next millisecond
+                self._last_ms += 1
+                self._sequence = 0
+            return self._last_ms, self._sequence
+
+    def next(self):
+        """Generate the next order number"""
+        ms, sequence = self._next_tick()
+        day = datetime.fromtimestamp((ms + EPOCH_MS) / 1000, tz=timezone.utc).strftime('%Y%m%d')
+        return (f'{self.prefix}-{day}-'
+                f'{encode_base32(ms, TIME_CHARS)}{encode_base32(sequence, SEQUENCE_CHARS)}{self._node}')
+
+
+order_numbers = OrderNumberGenerator()
+
+# A forked worker gets a new pid, so it needs a new node id and fresh state
+os.register_at_fork(after_in_child=order_numbers._reset)
@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+from cache import catalog_cache
+from db_config import db_connection, run_transaction, is_retryable_error
+from inventory import begin_stock_transaction
+from orders import place_order
+from queries import compile_sql, placeholders
+
+# Load environment variables
+load_dotenv()
+
+# 'sync' writes orders inside the request; 'queued' accepts them with 202
+ORDER_INTAKE_MODE = os.getenv('ORDER_INTAKE_MODE', 'sync')
+ORDER_QUEUE_PATH = os.getenv('ORDER_QUEUE_PATH', 'database/order_queue.db')
+ORDER_QUEUE_WORKERS = int(os.getenv('ORDER_QUEUE_WORKERS', '2'))
+ORDER_QUEUE_BATCH_SIZE = int(os.getenv('ORDER_QUEUE_BATCH_SIZE', '50'))
+ORDER_QUEUE_POLL_INTERVAL = float(os.getenv('ORDER_QUEUE_POLL_INTERVAL', '0.05'))  # seconds
+ORDER_QUEUE_MAX_ATTEMPTS = int(os.getenv('ORDER_QUEUE_MAX_ATTEMPTS', '5'))
+
+QUEUE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS order_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_number VARCHAR(50) NOT NULL UNIQUE,
+    payload TEXT NOT NULL, -- JSON: {"data": request body, "cart": priced cart}
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, processing, committed, failed
+    error TEXT,
+    attempts INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_queue_status ON order_queue(status, id);
+'''
+
+class OrderQueue:
+    """
+    Durable local queue of accepted-but-unwritten orders
+
+    Backed by its own SQLite file in WAL mode, so it can be shared by the
+    API process and standalone worker processes on the same host.
+    """
+
+    def __init__(self, path=ORDER_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(QUEUE_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; multi-statement operations use explicit BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = FULL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, order_number, data, cart):
+        """Durably record an accepted order"""
+        self._connection().execute('''
+            INSERT INTO order_queue (order_number, payload) VALUES (?, ?)
+        ''', (order_number, json.dumps({'data': data, 'cart': cart})))
+
+    def claim(self, batch_size=ORDER_QUEUE_BATCH_SIZE):
+        """Atomically move up to batch_size queued orders to 'processing'"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute('''
+                SELECT id, order_number, payload, attempts FROM order_queue
+                WHERE status = 'queued'
+                ORDER BY id
+                LIMIT ?
+            ''', (batch_size,)).fetchall()
+            if rows:
+                placeholders = ', '.join(['?'] * len(rows))
+                conn.execute(f'''
+                    UPDATE order_queue
+                    SET status = 'processing', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders})
+                ''', [row['id'] for row in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [
+            {'id': row['id'], 'order_number': row['order_number'],
+             'attempts': row['attempts'] + 1, **json.loads(row['payload'])}
+            for row in rows
+        ]
+
+    def finish(self, results):
+        """Record outcomes as {order_number: (status, error)}"""
+        # Never downgrade an order another worker already committed
+        self._connection().executemany('''
+            UPDATE order_queue SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE order_number = ? AND status != 'committed'
+        ''', [(status, error, number) for number, (status, error) in results.items()])
+
+    def release(self, entries, error, max_attempts=ORDER_QUEUE_MAX_ATTEMPTS):
+        """Put claimed orders back after a failed batch, failing those out of attempts"""
+        self._connection().executemany('''
+            UPDATE order_queue
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', [(max_attempts, error, entry['id']) for entry in entries])
+
+    def recover(self):
+        """Requeue orders left 'processing' by a worker that died mid-batch"""
+        self._connection().execute('''
+            UPDATE order_queue SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'processing'
+        ''')
+
+    def status(self, order_number):
+        """Queue state for an order number, or None if it was never queued"""
+        row = self._connection().execute('''
+            SELECT order_number, status, error, created_at, updated_at
+            FROM order_queue WHERE order_number = ?
+        ''', (order_number,)).fetchone()
+        return dict(row) if row else None
+
+    def stats(self):
+        """Number of queue entries per status"""
+        rows = self._connection().execute('''
+            SELECT status, COUNT(*) AS count FROM order_queue GROUP BY status
+        ''').fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+
+def write_batch(entries):
+    """
+    Write claimed orders to the main database in one transaction
+    Each order runs under a savepoint so a failing order (e.g. out of
+    stock) is rolled back on its own. Orders that already exist are
+    treated as committed, which makes re-processing after a crash safe.
+    Returns {order_number: (status, error)}.
+    """
+    numbers = [entry['order_number'] for entry in entries]
+
+    def work(cursor):
+        results = {}
+        begin_stock_transaction(cursor)
+
+        cursor.execute(compile_sql(f'''
+            SELECT order_number FROM orders WHERE order_number IN ({placeholders(len(numbers))})
+        '''), numbers)
+        existing = {row['order_number'] for row in cursor.fetchall()}
+
+        for entry in entries:
+            number = entry['order_number']
+            if number in existing:
+                results[number] = ('committed', None)
+                continue
+            cursor.execute('SAVEPOINT queued_order')
+            try:
+                place_order(cursor, entry['data'], entry['cart'], order_number=number)
+                cursor.execute('RELEASE SAVEPOINT queued_order')
+                results[number] = ('committed', None)
+            except Exception as e:
+                if is_retryable_error(e):
+                    raise
+                cursor.execute('ROLLBACK TO SAVEPOINT queued_order')
+                cursor.execute('RELEASE SAVEPOINT queued_order')
+                results[number] = ('failed', str(e))
+        return results
+
+    with db_connection() as conn:
+        return run_transaction(conn, work)
+
+class OrderQueueWorkers:
+    """Background thread pool that drains the order queue in batches"""
+
+    def __init__(self, queue, workers=ORDER_QUEUE_WORKERS, batch_size=ORDER_QUEUE_BATCH_SIZE,
+                 poll_interval=ORDER_QUEUE_POLL_INTERVAL, on_committed=None):
+        self.queue = queue
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.on_committed = on_committed  # called with the committed order numbers
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.queue.recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'order-queue-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        """Wake idle workers after an enqueue"""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def drain_once(self):
+        """Process one batch; returns the number of orders claimed"""
+        entries = self.queue.claim(self.batch_size)
+        if not entries:
+            return 0
+        try:
+            results = write_batch(entries)
+        except Exception as e:
+            print(f"Warning: order queue batch failed: {e}", file=sys.stderr)
+            self.queue.release(entries, str(e))
+            return len(entries)
+
+        self.queue.finish(results)
+        committed = [number for number, (status, _) in results.items() if status == 'committed']
+        if committed:
+            # Stock changed, so cached catalog reads are stale
+            catalog_cache.invalidate(stock_only=True)
+            if self.on_committed:
+                self.on_committed(committed)
+        return len(entries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.drain_once()
+            except Exception as e:
+                print(f"Warning: order queue worker error: {e}", file=sys.stderr)
+                claimed = 0
+            if not claimed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+if __name__ == '__main__':
+    # Standalone worker process: python database/order_queue.py
+    workers = OrderQueueWorkers(OrderQueue())
+    workers.start()
+    print(f"🐻 Draining order queue at {ORDER_QUEUE_PATH} with {workers.workers} workers...")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        workers.stop()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import re
+from collections import OrderedDict
+import psycopg2.extras
+from db_config import DB_TYPE, dict_from_row
+from order_numbers import order_numbers
+from queries import execute, executemany, fetch_one, insert_returning_id
+from inventory import begin_stock_transaction, lock_and_check_stock, reserve_stock
+from rollups import record_order_rollups
+
+def upsert_customer(cursor, data):
+    """
+    Return the id of the customer with data's email, creating it if needed
+    An existing row is only written when the order brings a non-empty name
+    or phone that differs from the stored one, so repeat checkouts by the
+    same customer do not update (and lock) the customers row.
+    """
+    email = data['customer_email']
+    fields = (data.get('first_name', ''), data.get('last_name', ''), data.get('phone', ''))
+    customer = fetch_one(cursor, 'customer_by_email', (email,))
+    if customer is None:
+        inserted = fetch_one(cursor, 'insert_customer', (email, *fields))
+        if inserted:
+            return inserted['id']
+        # Created by a concurrent checkout since the lookup
+        customer = fetch_one(cursor, 'customer_by_email', (email,))
+
+    stored = (customer['first_name'], customer['last_name'], customer['phone'])
+    merged = tuple(new or old for new, old in zip(fields, stored))
+    if merged != stored:
+        execute(cursor, 'update_customer', (*merged, customer['id']))
+    return customer['id']
+
+def normalize_address_field(value):
+    """Case-insensitive, with '.' and ',' dropped and whitespace collapsed"""
+    return ' '.join(re.sub(r'[.,]', ' ', str(value or '')).split()).casefold()
+
+def address_fields(address):
+    """Address columns in insert order, with the same defaults as before fingerprinting"""
+    return (
+        address['street_address'],
+        address.get('street_address_2', ''),
+        address['city'],
+        address['state'],
+        address['postal_code'],
+        address.get('country', 'USA')
+    )
+
+def address_fingerprint(address, address_type='shipping'):
+    """Hash of an address's normalized fields, unique per customer in addresses"""
+    normalized = [address_type] + [normalize_address_field(value) for value in address_fields(address)]
+    return hashlib.blake2b('\x1f'.join(normalized).encode(), digest_size=16).hexdigest()
+
+def upsert_shipping_address(cursor, customer_id, address):
+    """Id of the customer's matching shipping address, inserting it only if it is new"""
+    fingerprint = address_fingerprint(address)
+    inserted = fetch_one(cursor, 'insert_shipping_address', (customer_id, *address_fields(address), fingerprint))
+    if inserted:
+        return inserted['id']
+    return fetch_one(cursor, 'address_by_fingerprint', (customer_id, fingerprint))['id']
+
+def aggregate_quantities(items):
+    """Sum cart quantities per product id, keeping first-seen order"""
+    quantities = OrderedDict()
+    for item in items:
+        quantities[item['id']] = quantities.get(item['id'], 0) + item['quantity']
+    return quantities
+
+def insert_order_lines(cursor, order_id, items):
+    """
+    Write order_items, stock updates and inventory_transactions for a cart
+    Uses a constant number of statements regardless of cart size.
+    items are priced lines from PriceIndex.price_cart.
+    """
+    reserve_stock(cursor, aggregate_quantities(items))
+
+    line_rows = [
+        (order_id, item['id'], item['name'], item['quantity'], item['price'], item['subtotal'])
+        for item in items
+    ]
+    ledger_rows = [(item['id'], -item['quantity'], order_id) for item in items]
+
+    if DB_TYPE == 'postgresql':
+        psycopg2.extras.execute_values(cursor, '''
+            INSERT INTO order_items (order_id, product_id, product_name, quantity, unit_price, subtotal)
+            VALUES %s
+        ''', line_rows)
+
+        psycopg2.extras.execute_values(cursor, '''
+            INSERT INTO inventory_transactions (product_id, transaction_type, quantity_change, reference_id)
+            VALUES %s
+        ''', ledger_rows, template="(%s, 'sale', %s, %s)")
+    else:
+        executemany(cursor, 'insert_order_item', line_rows)
+        executemany(cursor, 'insert_sale_transaction', ledger_rows)
+
+def generate_order_number():
+    """Collision-free, time-ordered order number"""
+    return order_numbers.next()
+
+def place_order(cursor, data, cart, order_number=None):
+    """
+    Write a complete order inside the caller's transaction
+    cart is the server-side pricing from PriceIndex.price_cart.
+    order_number may be assigned up front, e.g. by the intake queue.
+    Stock is locked and checked before anything is written, so an
+    out-of-stock cart raises OutOfStockError without side effects.
+    Returns the new order id.
+    """
+    begin_stock_transaction(cursor)
+    lock_and_check_stock(cursor, aggregate_quantities(cart['items']))
+
+    # Returning customers and addresses are reused without writing
+    customer_id = upsert_customer(cursor, data)
+    shipping_address_id = upsert_shipping_address(cursor, customer_id, data['shipping_address'])
+
+    # Totals were computed server-side from the price index
+    subtotal = cart['subtotal']
+    tax = cart['tax']
+    shipping_cost = cart['shipping_cost']
+    total = cart['total']
+
+    # Generate order number
+    if order_number is None:
+        order_number = generate_order_number()
+
+    # Create order
+    order_id = insert_returning_id(cursor, 'insert_order', (
+        order_number, customer_id, shipping_address_id, subtotal, tax, shipping_cost, total
+    ))
+
+    # Create order items and update inventory in one batch
+    insert_order_lines(cursor, order_id, cart['items'])
+    record_order_rollups(cursor, cart['items'])
+
+    return order_id
+
+def fetch_order(cursor, order_number):
+    """
+    Load an order with its customer and items in a single query
+    Items are aggregated to JSON by the database (json_agg on PostgreSQL,
+    json_group_array on SQLite). Returns None if the order does not exist.
+    """
+    return order_from_row(fetch_one(cursor, 'order_by_number', (order_number,)))
+
+def order_from_row(row):
+    """Order dict from an order_by_number row (None stays None)"""
+    if not row:
+        return None
+
+    order = dict_from_row(row)
+    if isinstance(order['items'], str):
+        # SQLite returns the aggregate as text; psycopg2 decodes json itself
+        order['items'] = json.loads(order['items'])
+    return order
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from dotenv import load_dotenv
+from cache import catalog_cache
+from db_config import db_connection
+from queries import fetch_all
+
+# Load environment variables
+load_dotenv()
+
+# Reload at least this often to pick up catalog edits made by other processes
+PRICE_INDEX_MAX_AGE = float(os.getenv('PRICE_INDEX_MAX_AGE', '300'))  # seconds
+
+TAX_RATE = Decimal('0.0775')  # 7.75% CA tax
+FREE_SHIPPING_THRESHOLD = Decimal('50.00')
+FLAT_SHIPPING_COST = Decimal('5.99')
+CENTS = Decimal('0.01')
+
+ProductPrice = namedtuple('ProductPrice', ['price', 'name', 'is_active'])
+
+class InvalidCartError(Exception):
+    """Raised when a cart references unknown or inactive products or bad quantities"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def to_cents(value):
+    """Round a Decimal to whole cents"""
+    return value.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+class PriceIndex:
+    """
+    In-memory map of product id -> (price, name, active flag)
+
+    Loaded with one query and reloaded when the catalog version changes,
+    so pricing a cart never touches the database.
+    """
+
+    def __init__(self, cache=catalog_cache, max_age=PRICE_INDEX_MAX_AGE):
+        self.cache = cache
+        self.max_age = max_age
+        self._products = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with db_connection(readonly=True) as conn:
+            return {
+                row['id']: ProductPrice(Decimal(str(row['price'])), row['name'], bool(row['is_active']))
+                for row in fetch_all(conn.cursor(), 'product_prices')
+            }
+
+    def _is_stale(self):
+        return (self._products is None
+                or self._version != self.cache.catalog_version
+                or time.monotonic() - self._loaded_at > self.max_age)
+
+    def products(self):
+        """Current product map, reloading it if the catalog has changed"""
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    version = self.cache.catalog_version
+                    self._products = self._load()
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+        return self._products
+
+    def price_cart(self, items):
+        """
+        Validate and price a whole cart in one pass
+        Only product ids and quantities are taken from the client.
+        Returns {'items', 'subtotal', 'tax', 'shipping_cost', 'total'}.
+        """
+        products = self.products()
+        errors = []
+        lines = []
+        subtotal = Decimal('0')
+
+        if not isinstance(items, list):
+            raise InvalidCartError(['Cart items must be a list'])
+        if not items:
+            raise InvalidCartError(['Cart is empty'])
+
+        for position, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                errors.append(f'Cart item {position} must be an object')
+                continue
+            product_id = item.get('id')
+            quantity = item.get('quantity')
+            if not isinstance(product_id, int) or isinstance(product_id, bool):
+                errors.append(f'Product id for cart item {position} must be an integer')
+                continue
+            product = products.get(product_id)
+            if product is None or not product.is_active:
+                errors.append(f'Product {product_id} is not available')
+                continue
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                errors.append(f'Quantity for product {product_id} must be a positive integer')
+                continue
+            line_total = product.price * quantity
+            subtotal += line_total
+            lines.append({
+                'id': product_id,
+                'name': product.name,
+                'price': float(product.price),
+                'quantity': quantity,
+                'subtotal': float(line_total),
+            })
+
+        if errors:
+            raise InvalidCartError(errors)
+
+        tax = to_cents(subtotal * TAX_RATE)
+        shipping_cost = Decimal('0.00') if subtotal > FREE_SHIPPING_THRESHOLD else FLAT_SHIPPING_COST
+        return {
+            'items': lines,
+            'subtotal': float(subtotal),
+            'tax': float(tax),
+            'shipping_cost': float(shipping_cost),
+            'total': float(subtotal + tax + shipping_cost),
+        }
+
+
+price_index = PriceIndex()
@@ -0,0 +1,309 @@
+import hashlib
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+from db_config import DB_TYPE
+import metrics
+
+# Load environment variables
+load_dotenv()
+
+# Disable behind a transaction-mode pooler such as PgBouncer, where a
+# prepared statement may not exist on the server connection used next
+DB_PREPARE_STATEMENTS = os.getenv('DB_PREPARE_STATEMENTS', 'true').lower() == 'true'
+
+ORDER_ITEM_COLUMNS = ('id', 'order_id', 'product_id', 'product_name', 'quantity',
+                      'unit_price', 'subtotal', 'created_at')
+ORDER_ITEM_JSON_FIELDS = ', '.join(f"'{column}', oi.{column}" for column in ORDER_ITEM_COLUMNS)
+
+# Catalog reads list their columns so PostgreSQL's search_vector never reaches a response
+PRODUCT_COLUMNS = ('id', 'name', 'slug', 'category_id', 'description', 'price', 'image_url',
+                   'emoji', 'stock_quantity', 'is_active', 'featured', 'created_at', 'updated_at')
+JERKY_PRODUCT_COLUMNS = ('id', 'name', 'slug', 'title', 'description', 'price', 'weight',
+                         'image_url', 'status', 'badge_text', 'badge_color', 'display_order',
+                         'is_active', 'created_at', 'updated_at')
+PRODUCT_SELECT = ', '.join(f'p.{column}' for column in PRODUCT_COLUMNS)
+JERKY_PRODUCT_SELECT = ', '.join(JERKY_PRODUCT_COLUMNS)
+
+# Named queries use ? placeholders on every backend; a dict gives per-backend text
+QUERIES = {
+    'product_by_id': f'''
+        SELECT {PRODUCT_SELECT}, c.name as category_name, c.slug as category_slug
+        FROM products p
+        JOIN categories c ON p.category_id = c.id
+        WHERE p.id = ? AND p.is_active = TRUE
+    ''',
+    'categories': '''
+        SELECT * FROM categories
+        ORDER BY display_order ASC
+    ''',
+    'jerky_products': f'''
+        SELECT {JERKY_PRODUCT_SELECT} FROM jerky_products
+        WHERE is_active = TRUE
+        ORDER BY display_order ASC
+    ''',
+    'jerky_product_by_id': f'''
+        SELECT {JERKY_PRODUCT_SELECT} FROM jerky_products
+        WHERE id = ? AND is_active = TRUE
+    ''',
+    'product_prices': '''
+        SELECT id, name, price, is_active FROM products
+    ''',
+    'catalog_version': '''
+        SELECT version FROM catalog_version WHERE id = 1
+    ''',
+    'bump_catalog_version': '''
+        UPDATE catalog_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    ''',
+    'search_catalog': {
+        # Arguments: tsquery, tsquery, limit
+        'postgresql': '''
+            SELECT * FROM (
+                SELECT 'product' AS type, p.id, p.name, p.description, p.price, p.slug,
+                    p.emoji, p.image_url, c.slug AS category_slug,
+                    ts_rank(p.search_vector, q) AS rank
+                FROM products p
+                JOIN categories c ON p.category_id = c.id,
+                    to_tsquery('english', ?) q
+                WHERE p.is_active = TRUE AND p.search_vector @@ q
+                UNION ALL
+                SELECT 'jerky' AS type, j.id, j.title, j.description, j.price, j.slug,
+                    NULL, j.image_url, NULL,
+                    ts_rank(j.search_vector, q) AS rank
+                FROM jerky_products j,
+                    to_tsquery('english', ?) q
+                WHERE j.is_active = TRUE AND j.search_vector @@ q
+            ) results
+            ORDER BY rank DESC, type, id
+            LIMIT ?
+        ''',
+        # Arguments: MATCH expression, limit
+        # bm25() is lower-is-better; titles weigh 10x descriptions
+        'sqlite': '''
+            SELECT CASE WHEN s.rowid % 2 = 0 THEN 'product' ELSE 'jerky' END AS type,
+                COALESCE(p.id, j.id) AS id,
+                COALESCE(p.name, j.title) AS name,
+                COALESCE(p.description, j.description) AS description,
+                COALESCE(p.price, j.price) AS price,
+                COALESCE(p.slug, j.slug) AS slug,
+                p.emoji,
+                COALESCE(p.image_url, j.image_url) AS image_url,
+                c.slug AS category_slug,
+                -s.rank AS rank
+            FROM (
+                SELECT rowid, bm25(catalog_search, 10.0, 1.0) AS rank
+                FROM catalog_search
+                WHERE catalog_search MATCH ?
+            ) s
+            LEFT JOIN products p ON s.rowid % 2 = 0 AND p.id = s.rowid / 2 AND p.is_active = TRUE
+            LEFT JOIN categories c ON c.id = p.category_id
+            LEFT JOIN jerky_products j ON s.rowid % 2 = 1 AND j.id = s.rowid / 2 AND j.is_active = TRUE
+            WHERE p.id IS NOT NULL OR j.id IS NOT NULL
+            ORDER BY s.rank
+            LIMIT ?
+        ''',
+    },
+    'customer_by_email': '''
+        SELECT id, first_name, last_name, phone FROM customers WHERE email = ?
+    ''',
+    # SQLite supports upsert ... RETURNING from 3.35; no row comes back on a conflict
+    'insert_customer': '''
+        INSERT INTO customers (email, first_name, last_name, phone)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id
+    ''',
+    'update_customer': '''
+        UPDATE customers
+        SET first_name = ?, last_name = ?, phone = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''',
+    'insert_shipping_address': '''
+        INSERT INTO addresses
+        (customer_id, address_type, street_address, street_address_2, city, state, postal_code, country, fingerprint)
+        VALUES (?, 'shipping', ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (customer_id, fingerprint) DO NOTHING
+        RETURNING id
+    ''',
+    'address_by_fingerprint': '''
+        SELECT id FROM addresses WHERE customer_id = ? AND fingerprint = ?
+    ''',
+    'insert_order': '''
+        INSERT INTO orders
+        (order_number, customer_id, shipping_address_id, subtotal, tax, shipping_cost, total, status, payment_status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', 'pending')
+    ''',
+    'insert_order_item': '''
+        INSERT INTO order_items (order_id, product_id, product_name, quantity, unit_price, subtotal)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'insert_sale_transaction': '''
+        INSERT INTO inventory_transactions (product_id, transaction_type, quantity_change, reference_id)
+        VALUES (?, 'sale', ?, ?)
+    ''',
+    'order_by_id': '''
+        SELECT * FROM orders WHERE id = ?
+    ''',
+    'order_by_number': {
+        'postgresql': '''
+            SELECT o.*, c.email, c.first_name, c.last_name,
+                COALESCE((
+                    SELECT json_agg(oi ORDER BY oi.id)
+                    FROM order_items oi
+                    WHERE oi.order_id = o.id
+                ), '[]'::json) AS items
+            FROM orders o
+            JOIN customers c ON o.customer_id = c.id
+            WHERE o.order_number = ?
+        ''',
+        'sqlite': f'''
+            SELECT o.*, c.email, c.first_name, c.last_name,
+                (
+                    SELECT json_group_array(json_object({ORDER_ITEM_JSON_FIELDS}))
+                    FROM (SELECT * FROM order_items WHERE order_id = o.id ORDER BY id) oi
+                ) AS items
+            FROM orders o
+            JOIN customers c ON o.customer_id = c.id
+            WHERE o.order_number = ?
+        ''',
+    },
+    # Stats read only the rollup tables (see rollups.py)
+    'stats_daily_sales': '''
+        SELECT sales_date, SUM(units_sold) AS units_sold, SUM(revenue) AS revenue,
+            COUNT(*) AS products_sold
+        FROM daily_product_sales
+        WHERE sales_date >= ?
+        GROUP BY sales_date
+        ORDER BY sales_date
+    ''',
+    'stats_best_sellers': '''
+        SELECT product_id, MAX(product_name) AS product_name,
+            SUM(units_sold) AS units_sold, SUM(revenue) AS revenue, SUM(order_count) AS order_count
+        FROM daily_product_sales
+        WHERE sales_date >= ?
+        GROUP BY product_id
+        ORDER BY units_sold DESC, product_id
+        LIMIT ?
+    ''',
+    'stats_stock_movement': '''
+        SELECT * FROM product_stock_movement
+        ORDER BY product_id
+    ''',
+}
+
+# Inserts run through insert_returning_id
+INSERTS_RETURNING_ID = {'insert_order'}
+
+def numbered_placeholders(text):
+    """Rewrite ? placeholders as PostgreSQL's $1, $2, ..."""
+    parts = text.split('?')
+    return parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], start=1))
+
+class Query:
+    """
+    A statement compiled for one backend
+
+    sql is the DB-API text (? on SQLite, %s on PostgreSQL). On PostgreSQL
+    prepare_sql/execute_sql are the PREPARE and EXECUTE forms used to run
+    it as a server-side prepared statement.
+    """
+
+    def __init__(self, name, text, backend=DB_TYPE, prepare=True):
+        self.name = name
+        self.backend = backend
+        self.param_count = text.count('?')
+        self.prepared_name = None
+        if backend == 'postgresql':
+            self.sql = text.replace('%', '%%').replace('?', '%s')
+            # $n placeholders, as PREPARE and asyncpg expect
+            self.native_sql = numbered_placeholders(text)
+            if prepare:
+                # Named after the text so every process agrees on it
+                digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+                self.prepared_name = f'q_{name}_{digest}'
+                self.prepare_sql = f'PREPARE {self.prepared_name} AS {self.native_sql}'
+                args = ', '.join(['%s'] * self.param_count)
+                self.execute_sql = f'EXECUTE {self.prepared_name}' + (f' ({args})' if args else '')
+        else:
+            self.sql = text
+            self.native_sql = text
+
+    def execute(self, cursor, params=()):
+        with metrics.query(self.name):
+            self._execute(cursor, params)
+            if cursor.description is None:
+                # Writes report affected rows; result sets are counted as they are fetched
+                metrics.record_rows(cursor.rowcount)
+        return cursor
+
+    def _execute(self, cursor, params):
+        # Named (server-side) cursors wrap the query in DECLARE, which cannot EXECUTE
+        if self.prepared_name and DB_PREPARE_STATEMENTS and getattr(cursor, 'name', None) is None:
+            prepared = getattr(cursor.connection, 'prepared', None)
+            if prepared is not None:
+                if self.prepared_name not in prepared:
+                    cursor.execute(self.prepare_sql)
+                    prepared.add(self.prepared_name)
+                cursor.execute(self.execute_sql, params)
+                return
+        cursor.execute(self.sql, params)
+
+
+def compile_queries(backend=DB_TYPE):
+    """Compile every named query for a backend"""
+    compiled = {}
+    for name, text in QUERIES.items():
+        if isinstance(text, dict):
+            text = text[backend]
+        if backend == 'postgresql' and name in INSERTS_RETURNING_ID:
+            text = text.rstrip() + '\n        RETURNING id'
+        compiled[name] = Query(name, text, backend)
+    return compiled
+
+COMPILED = compile_queries()
+
+@lru_cache(maxsize=256)
+def compile_sql(text):
+    """
+    Compile ad-hoc SQL written with ? placeholders, e.g. for IN lists
+    The result is cached per text, so SQLite's statement cache sees the
+    same string for the same statement shape.
+    """
+    return Query('adhoc', text, prepare=False).sql
+
+@lru_cache(maxsize=256)
+def compile_native_sql(text):
+    """Ad-hoc SQL with ? placeholders in the driver-native form asyncpg expects ($n)"""
+    return numbered_placeholders(text)
+
+def placeholders(count):
+    """Comma-separated ? placeholders for an IN list of count values"""
+    return ', '.join(['?'] * count)
+
+def execute(cursor, name, params=()):
+    """Run a named query and return the cursor"""
+    return COMPILED[name].execute(cursor, params)
+
+def executemany(cursor, name, rows):
+    """Run a named query once per row of parameters"""
+    with metrics.query(name):
+        cursor.executemany(COMPILED[name].sql, rows)
+        metrics.record_rows(cursor.rowcount)
+
+def fetch_one(cursor, name, params=()):
+    """First row of a named query, or None"""
+    return metrics.timed_fetch(execute(cursor, name, params).fetchone)
+
+def fetch_all(cursor, name, params=()):
+    """All rows of a named query"""
+    return metrics.timed_fetch(execute(cursor, name, params).fetchall)
+
+def insert_returning_id(cursor, name, params=()):
+    """Run a named insert and return the new row id (RETURNING on PostgreSQL, lastrowid on SQLite)"""
+    if name not in INSERTS_RETURNING_ID:
+        raise ValueError(f'{name} is not registered in INSERTS_RETURNING_ID')
+    execute(cursor, name, params)
+    if DB_TYPE == 'postgresql':
+        return cursor.fetchone()['id']
+    return cursor.lastrowid
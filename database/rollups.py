@@ -0,0 +1,177 @@
+"""
+Sales and stock rollup tables
+
+daily_product_sales and product_stock_movement are updated inside the
+order transaction by record_order_rollups, so the /api/stats endpoints
+never aggregate order_items or inventory_transactions.
+
+Usage:
+    python database/rollups.py rebuild   # recompute both rollups from the base tables
+    python database/rollups.py check     # compare the rollups with a full recompute
+"""
+import sys
+from collections import OrderedDict
+from decimal import Decimal
+import psycopg2.extras
+from db_config import db_connection, run_transaction, DB_TYPE
+
+# Full recomputes, shared by rebuild and check
+DAILY_PRODUCT_SALES_SQL = '''
+    SELECT DATE(created_at) AS sales_date, product_id, MAX(product_name) AS product_name,
+        SUM(quantity) AS units_sold, SUM(subtotal) AS revenue,
+        COUNT(DISTINCT order_id) AS order_count
+    FROM order_items
+    GROUP BY DATE(created_at), product_id
+'''
+
+PRODUCT_STOCK_MOVEMENT_SQL = '''
+    SELECT product_id,
+        SUM(CASE WHEN quantity_change > 0 THEN quantity_change ELSE 0 END) AS units_in,
+        SUM(CASE WHEN quantity_change < 0 THEN -quantity_change ELSE 0 END) AS units_out,
+        SUM(quantity_change) AS net_change,
+        COUNT(*) AS transaction_count,
+        MAX(created_at) AS last_transaction_at
+    FROM inventory_transactions
+    GROUP BY product_id
+'''
+
+UPSERT_DAILY_PRODUCT_SALES = '''
+    INSERT INTO daily_product_sales (sales_date, product_id, product_name, units_sold, revenue, order_count)
+    VALUES {values}
+    ON CONFLICT (sales_date, product_id) DO UPDATE SET
+        product_name = excluded.product_name,
+        units_sold = daily_product_sales.units_sold + excluded.units_sold,
+        revenue = daily_product_sales.revenue + excluded.revenue,
+        order_count = daily_product_sales.order_count + excluded.order_count
+'''
+
+UPSERT_PRODUCT_STOCK_MOVEMENT = '''
+    INSERT INTO product_stock_movement (product_id, units_in, units_out, net_change, transaction_count, last_transaction_at)
+    VALUES {values}
+    ON CONFLICT (product_id) DO UPDATE SET
+        units_in = product_stock_movement.units_in + excluded.units_in,
+        units_out = product_stock_movement.units_out + excluded.units_out,
+        net_change = product_stock_movement.net_change + excluded.net_change,
+        transaction_count = product_stock_movement.transaction_count + excluded.transaction_count,
+        last_transaction_at = excluded.last_transaction_at
+'''
+
+def record_order_rollups(cursor, items):
+    """
+    Add an order's lines to the rollups inside the order's transaction
+    items are priced lines from PriceIndex.price_cart; each line is one
+    'sale' inventory transaction. Rows are keyed by product, which the
+    order already holds locked, so this adds no new contention.
+    """
+    products = OrderedDict()
+    for item in items:
+        name, units, revenue, lines = products.get(item['id'], (item['name'], 0, Decimal('0'), 0))
+        products[item['id']] = (name, units + item['quantity'],
+                                revenue + Decimal(str(item['subtotal'])), lines + 1)
+
+    sales_rows = [(product_id, name, units, revenue if DB_TYPE == 'postgresql' else float(revenue), 1)
+                  for product_id, (name, units, revenue, _) in products.items()]
+    movement_rows = [(product_id, 0, units, -units, lines)
+                     for product_id, (_, units, _, lines) in products.items()]
+
+    if DB_TYPE == 'postgresql':
+        psycopg2.extras.execute_values(
+            cursor, UPSERT_DAILY_PRODUCT_SALES.format(values='%s'), sales_rows,
+            template='(CURRENT_DATE, %s, %s, %s, %s, %s)')
+        psycopg2.extras.execute_values(
+            cursor, UPSERT_PRODUCT_STOCK_MOVEMENT.format(values='%s'), movement_rows,
+            template='(%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)')
+    else:
+        cursor.executemany(
+            UPSERT_DAILY_PRODUCT_SALES.format(values='(CURRENT_DATE, ?, ?, ?, ?, ?)'), sales_rows)
+        cursor.executemany(
+            UPSERT_PRODUCT_STOCK_MOVEMENT.format(values='(?, ?, ?, ?, ?, CURRENT_TIMESTAMP)'), movement_rows)
+
+def rebuild_rollups(conn):
+    """Replace both rollups with a full recompute in one transaction"""
+    def work(cursor):
+        if DB_TYPE == 'postgresql':
+            # Checkouts wait until the rebuild commits instead of racing it
+            cursor.execute('LOCK TABLE daily_product_sales, product_stock_movement IN EXCLUSIVE MODE')
+        elif not cursor.connection.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('DELETE FROM daily_product_sales')
+        cursor.execute(f'''
+            INSERT INTO daily_product_sales (sales_date, product_id, product_name, units_sold, revenue, order_count)
+            {DAILY_PRODUCT_SALES_SQL}
+        ''')
+        sales = cursor.rowcount
+        cursor.execute('DELETE FROM product_stock_movement')
+        cursor.execute(f'''
+            INSERT INTO product_stock_movement
+            (product_id, units_in, units_out, net_change, transaction_count, last_transaction_at)
+            {PRODUCT_STOCK_MOVEMENT_SQL}
+        ''')
+        return sales, cursor.rowcount
+
+    return run_transaction(conn, work)
+
+def _keyed(rows, key_columns, value_columns):
+    keyed = {}
+    for row in rows:
+        key = tuple(str(row[column]) for column in key_columns)
+        keyed[key] = tuple(
+            round(float(row[column]), 2) if column == 'revenue' else row[column]
+            for column in value_columns
+        )
+    return keyed
+
+def _diff(name, stored, expected):
+    problems = []
+    for key in sorted(set(stored) | set(expected)):
+        if stored.get(key) != expected.get(key):
+            problems.append(f"{name} {key}: rollup {stored.get(key)} != recomputed {expected.get(key)}")
+    return problems
+
+def check_rollups(conn):
+    """
+    Compare the rollups with a full recompute from one consistent snapshot
+    Returns a list of human-readable mismatches (empty when consistent).
+    """
+    cursor = conn.cursor()
+    if DB_TYPE == 'postgresql':
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+    else:
+        cursor.execute('BEGIN')
+    try:
+        sales_columns = ('units_sold', 'revenue', 'order_count')
+        cursor.execute('SELECT * FROM daily_product_sales')
+        stored_sales = _keyed(cursor.fetchall(), ('sales_date', 'product_id'), sales_columns)
+        cursor.execute(DAILY_PRODUCT_SALES_SQL)
+        expected_sales = _keyed(cursor.fetchall(), ('sales_date', 'product_id'), sales_columns)
+
+        movement_columns = ('units_in', 'units_out', 'net_change', 'transaction_count')
+        cursor.execute('SELECT * FROM product_stock_movement')
+        stored_movement = _keyed(cursor.fetchall(), ('product_id',), movement_columns)
+        cursor.execute(PRODUCT_STOCK_MOVEMENT_SQL)
+        expected_movement = _keyed(cursor.fetchall(), ('product_id',), movement_columns)
+    finally:
+        conn.rollback()
+
+    return (_diff('daily_product_sales', stored_sales, expected_sales)
+            + _diff('product_stock_movement', stored_movement, expected_movement))
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    with db_connection() as conn:
+        if command == 'rebuild':
+            sales, movement = rebuild_rollups(conn)
+            print(f"✓ Rebuilt rollups: {sales} daily product sales rows, {movement} stock movement rows")
+        elif command == 'check':
+            problems = check_rollups(conn)
+            for problem in problems:
+                print(f"  {problem}")
+            if problems:
+                print(f"❌ {len(problems)} rollup rows disagree with the base tables "
+                      f"(fix with: python database/rollups.py rebuild)")
+                sys.exit(1)
+            print("✓ Rollups match the base tables")
+        else:
+            print(f"Unknown command: {command} (expected rebuild or check)")
+            sys.exit(2)
@@ -0,0 +1,179 @@
+import itertools
+import json
+import os
+from json.encoder import encode_basestring_ascii
+from dotenv import load_dotenv
+import psycopg2.extensions
+from db_config import DB_TYPE
+from metrics import timed, timed_fetch
+
+# Load environment variables
+load_dotenv()
+
+# Rows fetched per round trip when streaming a result set
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '500'))
+
+def _encode_bool(value):
+    return 'true' if value else 'false'
+
+def _encode_null(value):
+    return 'null'
+
+# Encoders for the types drivers return most, keyed by exact type
+VALUE_ENCODERS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: float.__repr__,
+    bool: _encode_bool,
+    type(None): _encode_null,
+}
+
+NUMBER_TYPES = {int, float}
+NULL_TYPE = {type(None)}
+
+def tuple_cursor(conn):
+    """Cursor returning plain tuples, skipping per-row dict/Row construction"""
+    if DB_TYPE == 'postgresql':
+        return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+_stream_ids = itertools.count(1)
+
+def stream_cursor(conn, batch_size=STREAM_BATCH_SIZE):
+    """
+    Tuple cursor that holds at most one batch of rows in client memory
+    On PostgreSQL this is a named (server-side) cursor, so rows stay on
+    the server until fetched; SQLite steps through results lazily anyway.
+    """
+    if DB_TYPE == 'postgresql':
+        cursor = conn.cursor(name=f'stream_{next(_stream_ids)}',
+                             cursor_factory=psycopg2.extensions.cursor)
+        cursor.itersize = batch_size
+        return cursor
+    return tuple_cursor(conn)
+
+def iter_batches(cursor, batch_size=STREAM_BATCH_SIZE):
+    """Yield the cursor's remaining rows in fetchmany batches"""
+    while True:
+        rows = timed_fetch(cursor.fetchmany, batch_size)
+        if not rows:
+            return
+        yield rows
+
+class RowShape:
+    """
+    Column layout of a result set, worked out once per query
+
+    Converts tuple rows to dicts, or encodes them straight to JSON objects
+    without building a dict per row. Rows may carry extra trailing
+    columns beyond those in the shape; they are ignored.
+    """
+
+    def __init__(self, columns, sort_keys=True, default=None):
+        self.columns = tuple(columns)
+        self.default = default
+        # Keys are emitted sorted, like Flask's JSON provider
+        order = sorted(range(len(self.columns)), key=self.columns.__getitem__) if sort_keys \
+            else range(len(self.columns))
+        self._order = list(order)
+        # One %-template per shape: '{"id":%s,"name":%s}'
+        self._template = '{' + ','.join(
+            encode_basestring_ascii(self.columns[index]).replace('%', '%%') + ':%s' for index in self._order
+        ) + '}'
+
+    @classmethod
+    def from_cursor(cls, cursor, skip_last=0, **kwargs):
+        """Shape of the cursor's current result, minus skip_last helper columns"""
+        columns = [column[0] for column in cursor.description]
+        if skip_last:
+            columns = columns[:-skip_last]
+        return cls(columns, **kwargs)
+
+    def dict(self, row):
+        return dict(zip(self.columns, row))
+
+    def dicts(self, rows):
+        columns = self.columns
+        with timed('convert'):
+            return [dict(zip(columns, row)) for row in rows]
+
+    def _encode_other(self, value):
+        return json.dumps(value, default=self.default)
+
+    def _encode_column(self, values):
+        types = set(map(type, values))
+        if types <= NUMBER_TYPES:
+            # Numbers only (SQLite REAL columns mix int and float): encoded in C
+            return list(map(repr, values))
+        if types == NULL_TYPE:
+            return ['null'] * len(values)
+        has_null = bool(types & NULL_TYPE)
+        types -= NULL_TYPE
+        if len(types) == 1:
+            encoder = VALUE_ENCODERS.get(types.pop())
+            if encoder and has_null:
+                return [encoder(value) if value is not None else 'null' for value in values]
+            if encoder:
+                # Homogeneous column: the whole column is encoded in C
+                return list(map(encoder, values))
+        get_encoder = VALUE_ENCODERS.get
+        other = self._encode_other
+        return [get_encoder(type(value), other)(value) for value in values]
+
+    def encode_rows(self, rows):
+        """
+        Rows as a list of JSON object strings
+        Values are encoded column by column and spliced into the shape's
+        template, so no dict is built for any row.
+        """
+        if not rows:
+            return []
+        if not self.columns:
+            return ['{}'] * len(rows)
+        with timed('convert'):
+            columns = list(zip(*rows))
+            encoded = [self._encode_column(columns[index]) for index in self._order]
+            return list(map(self._template.__mod__, zip(*encoded)))
+
+    def encode(self, row):
+        """One row as a JSON object"""
+        return self.encode_rows([row])[0]
+
+    def json_chunks(self, batches):
+        """Yield a JSON array of objects piece by piece from an iterable of row batches"""
+        yield '['
+        first = True
+        for rows in batches:
+            if not rows:
+                continue
+            chunk = ','.join(self.encode_rows(rows))
+            if first:
+                first = False
+                yield chunk
+            else:
+                yield ',' + chunk
+        yield ']'
+
+    def json_array(self, rows):
+        """All rows as a JSON array string"""
+        return ''.join(self.json_chunks([rows]))
+
+
+def fetch_dicts(cursor):
+    """All remaining rows of a tuple cursor as dicts"""
+    return RowShape.from_cursor(cursor, sort_keys=False).dicts(timed_fetch(cursor.fetchall))
+
+def fetch_json(cursor, skip_last=0, default=None):
+    """All remaining rows of a tuple cursor encoded as a JSON array string"""
+    rows = timed_fetch(cursor.fetchall)
+    return RowShape.from_cursor(cursor, skip_last=skip_last, default=default).json_array(rows)
+
+def stream_json(cursor, skip_last=0, default=None, batch_size=STREAM_BATCH_SIZE):
+    """Yield an executed cursor's rows as a JSON array, encoding one batch at a time"""
+    batches = iter_batches(cursor, batch_size)
+    # A named PostgreSQL cursor has no description until the first fetch
+    first = next(batches, [])
+    shape = RowShape.from_cursor(cursor, skip_last=skip_last, default=default)
+    yield from shape.json_chunks(itertools.chain([first], batches))
@@ -125,11 +125,106 @@ CREATE TABLE IF NOT EXISTS inventory_transactions (
     FOREIGN KEY (product_id) REFERENCES products(id)
 );
 
+-- Jerky Products table (for the parody "Reserve Collection" section)
+CREATE TABLE IF NOT EXISTS jerky_products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    slug VARCHAR(255) NOT NULL UNIQUE,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    price DECIMAL(10, 2) NOT NULL,
+    weight VARCHAR(50),
+    image_url VARCHAR(500),
+    status VARCHAR(50) DEFAULT 'available', -- 'sold_out', 'coming_soon', 'seasonal', 'available'
+    badge_text VARCHAR(50),
+    badge_color VARCHAR(20),
+    display_order INTEGER DEFAULT 0,
+    is_active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Sales rollup: one row per product per day, maintained as orders commit
+-- (rebuild with: python database/rollups.py rebuild)
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    sales_date DATE NOT NULL,
+    product_id INTEGER NOT NULL,
+    product_name VARCHAR(255) NOT NULL,
+    units_sold INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, product_id)
+);
+
+-- Stock movement rollup: inventory_transactions summed per product
+CREATE TABLE IF NOT EXISTS product_stock_movement (
+    product_id INTEGER PRIMARY KEY,
+    units_in INTEGER NOT NULL DEFAULT 0,
+    units_out INTEGER NOT NULL DEFAULT 0,
+    net_change INTEGER NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    last_transaction_at TIMESTAMP
+);
+
+-- Single-row catalog version, bumped by every bulk catalog import
+-- (python database/import_catalog.py) so API caches in any process reload
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1);
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
 CREATE INDEX IF NOT EXISTS idx_products_active ON products(is_active);
+-- Backs the keyset-paginated listing ORDER BY featured DESC, name, id
+CREATE INDEX IF NOT EXISTS idx_products_listing ON products(featured DESC, name, id);
+CREATE INDEX IF NOT EXISTS idx_products_category_listing ON products(category_id, featured DESC, name, id);
 CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
 CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
 CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
 CREATE INDEX IF NOT EXISTS idx_addresses_customer ON addresses(customer_id);
+CREATE INDEX IF NOT EXISTS idx_jerky_products_active ON jerky_products(is_active);
+CREATE INDEX IF NOT EXISTS idx_jerky_products_status ON jerky_products(status);
+
+-- Full-text search over products (name, description) and jerky products (title, description)
+-- rowid = id * 2 for products and id * 2 + 1 for jerky products
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5(
+    title,
+    description,
+    tokenize = 'porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+    INSERT INTO catalog_search (rowid, title, description) VALUES (new.id * 2, new.name, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF name, description ON products BEGIN
+    DELETE FROM catalog_search WHERE rowid = old.id * 2;
+    INSERT INTO catalog_search (rowid, title, description) VALUES (new.id * 2, new.name, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+    DELETE FROM catalog_search WHERE rowid = old.id * 2;
+END;
+
+CREATE TRIGGER IF NOT EXISTS jerky_products_search_insert AFTER INSERT ON jerky_products BEGIN
+    INSERT INTO catalog_search (rowid, title, description) VALUES (new.id * 2 + 1, new.title, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS jerky_products_search_update AFTER UPDATE OF title, description ON jerky_products BEGIN
+    DELETE FROM catalog_search WHERE rowid = old.id * 2 + 1;
+    INSERT INTO catalog_search (rowid, title, description) VALUES (new.id * 2 + 1, new.title, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS jerky_products_search_delete AFTER DELETE ON jerky_products BEGIN
+    DELETE FROM catalog_search WHERE rowid = old.id * 2 + 1;
+END;
+
+-- Rebuild the search index from rows that predate the triggers
+DELETE FROM catalog_search;
+INSERT INTO catalog_search (rowid, title, description) SELECT id * 2, name, description FROM products;
+INSERT INTO catalog_search (rowid, title, description) SELECT id * 2 + 1, title, description FROM jerky_products;
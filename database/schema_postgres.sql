@@ -144,9 +144,44 @@ CREATE TABLE IF NOT EXISTS jerky_products (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Sales rollup: one row per product per day, maintained as orders commit
+-- (rebuild with: python database/rollups.py rebuild)
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    sales_date DATE NOT NULL,
+    product_id INTEGER NOT NULL,
+    product_name VARCHAR(255) NOT NULL,
+    units_sold INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, product_id)
+);
+
+-- Stock movement rollup: inventory_transactions summed per product
+CREATE TABLE IF NOT EXISTS product_stock_movement (
+    product_id INTEGER PRIMARY KEY,
+    units_in INTEGER NOT NULL DEFAULT 0,
+    units_out INTEGER NOT NULL DEFAULT 0,
+    net_change INTEGER NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    last_transaction_at TIMESTAMP
+);
+
+-- Single-row catalog version, bumped by every bulk catalog import
+-- (python database/import_catalog.py) so API caches in any process reload
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING;
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
 CREATE INDEX IF NOT EXISTS idx_products_active ON products(is_active);
+-- Backs the keyset-paginated listing ORDER BY featured DESC, name, id
+CREATE INDEX IF NOT EXISTS idx_products_listing ON products(featured DESC, name, id);
+CREATE INDEX IF NOT EXISTS idx_products_category_listing ON products(category_id, featured DESC, name, id);
 CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
 CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
@@ -155,3 +190,41 @@ CREATE INDEX IF NOT EXISTS idx_addresses_customer ON addresses(customer_id);
 CREATE INDEX IF NOT EXISTS idx_jerky_products_active ON jerky_products(is_active);
 CREATE INDEX IF NOT EXISTS idx_jerky_products_status ON jerky_products(status);
 
+-- Full-text search over products (name, description) and jerky products (title, description)
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE jerky_products ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION jerky_products_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_search_vector_trigger ON products;
+CREATE TRIGGER products_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_update();
+
+DROP TRIGGER IF EXISTS jerky_products_search_vector_trigger ON jerky_products;
+CREATE TRIGGER jerky_products_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON jerky_products
+    FOR EACH ROW EXECUTE FUNCTION jerky_products_search_vector_update();
+
+-- Backfill rows that predate the triggers
+UPDATE products SET name = name WHERE search_vector IS NULL;
+UPDATE jerky_products SET title = title WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_products_search ON products USING GIN(search_vector);
+CREATE INDEX IF NOT EXISTS idx_jerky_products_search ON jerky_products USING GIN(search_vector);
@@ -0,0 +1,32 @@
+import re
+from db_config import DB_TYPE, dict_from_row
+from queries import fetch_all
+
+MAX_SEARCH_RESULTS = 100
+DEFAULT_SEARCH_RESULTS = 20
+
+def search_terms(query):
+    """Split user input into plain word tokens (drops FTS operators and punctuation)"""
+    return re.findall(r'\w+', query.lower())
+
+def search_catalog(cursor, query, limit=DEFAULT_SEARCH_RESULTS):
+    """
+    Ranked full-text search over active products and jerky products
+    Every term must match as a word prefix, e.g. 'hood' finds 'Hoodie'.
+    Returns a list of dicts with a 'type' of 'product' or 'jerky'.
+    """
+    params = search_params(query, limit)
+    if params is None:
+        return []
+    return [dict_from_row(row) for row in fetch_all(cursor, 'search_catalog', params)]
+
+def search_params(query, limit=DEFAULT_SEARCH_RESULTS):
+    """Parameters of the search_catalog query, or None when the query has no words"""
+    terms = search_terms(query)
+    if not terms:
+        return None
+    if DB_TYPE == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return (tsquery, tsquery, limit)
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return (match, limit)
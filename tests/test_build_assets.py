@@ -0,0 +1,95 @@
+"""
+Asset build and encoding negotiation
+
+Run with: python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import build_assets
+from build_assets import build, StaticAssets, ENTRY_PAGE, IMAGE_ASSETS, TEXT_ASSETS
+
+class BuildTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.out = os.path.join(cls.directory, 'dist')
+        cls.manifest = build(cls.out)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def built(self, name):
+        return os.path.join(self.out, name)
+
+    def test_manifest_lists_every_asset(self):
+        self.assertEqual(set(self.manifest['assets']), set(TEXT_ASSETS + IMAGE_ASSETS))
+        self.assertEqual(set(self.manifest['images']), set(IMAGE_ASSETS))
+        for name in self.manifest['assets'].values():
+            self.assertTrue(os.path.isfile(self.built(name)), name)
+
+    def test_text_assets_have_gzip_and_brotli_copies(self):
+        for name in [ENTRY_PAGE, *(self.manifest['assets'][asset] for asset in TEXT_ASSETS)]:
+            self.assertEqual(sorted(self.manifest['encodings'][name]), ['.br', '.gz'])
+            for suffix in ('.br', '.gz'):
+                self.assertTrue(os.path.isfile(self.built(name + suffix)), name + suffix)
+
+    def test_image_variants(self):
+        for name, variants in self.manifest['images'].items():
+            self.assertEqual([width for width, _ in variants['webp']],
+                             [width for width, _ in variants['fallback']])
+            for width, file in variants['webp']:
+                self.assertTrue(file.endswith('.webp'), file)
+                self.assertTrue(os.path.isfile(self.built(file)), file)
+            for width, file in variants['fallback']:
+                self.assertTrue(file.endswith(('.png', '.jpg')), file)
+                self.assertTrue(os.path.isfile(self.built(file)), file)
+        with open(self.built(ENTRY_PAGE), encoding='utf-8') as f:
+            self.assertIn('<source type="image/webp"', f.read())
+
+    def test_resolve_negotiates_encoding(self):
+        assets = StaticAssets(self.out)
+        script = self.manifest['assets']['script.js']
+        path, content_type, encoding, cache_control = assets.resolve(script, 'gzip, deflate, br')
+        self.assertEqual((path, encoding), (self.built(script + '.br'), 'br'))
+        self.assertEqual(content_type, 'text/javascript; charset=utf-8')
+        self.assertIn('immutable', cache_control)
+        self.assertEqual(assets.resolve(script, 'gzip, br;q=0')[1:3],
+                         ('text/javascript; charset=utf-8', 'gzip'))
+        self.assertEqual(assets.resolve(script, 'gzip, br;q=0.5.1')[2], 'gzip')
+        path, _, encoding, _ = assets.resolve(script, '')
+        self.assertEqual((path, encoding), (self.built(script), None))
+        self.assertEqual(assets.resolve(ENTRY_PAGE, 'br')[3], 'no-cache')
+        self.assertIsNone(assets.resolve('manifest.json', 'br'))
+
+class MissingDependencyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.out = os.path.join(self.directory, 'dist')
+
+    def test_missing_pillow_fails_unless_opted_out(self):
+        with mock.patch.object(build_assets, 'Image', None):
+            with self.assertRaises(SystemExit):
+                build(self.out)
+            manifest = build(self.out, with_images=False)
+        self.assertEqual(manifest['images'], {})
+
+    def test_missing_brotli_fails_unless_opted_out(self):
+        with mock.patch.object(build_assets, 'brotli', None):
+            with self.assertRaises(SystemExit):
+                build(self.out, with_images=False)
+            manifest = build(self.out, with_images=False, with_brotli=False)
+        self.assertNotIn('.br', manifest['encodings'][ENTRY_PAGE])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Chunk boundaries of the analytics export
+
+Run with: python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database'))
+os.environ.setdefault('DB_TYPE', 'sqlite')
+
+from export_analytics import next_chunk_end
+
+def dict_row(cursor, row):
+    """Rows as plain dicts, like psycopg2's RealDictCursor on PostgreSQL"""
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+class NextChunkEndTest(unittest.TestCase):
+
+    def connect(self, row_factory):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = row_factory
+        conn.execute('CREATE TABLE orders (id INTEGER PRIMARY KEY, created_at TIMESTAMP)')
+        conn.executemany("INSERT INTO orders (id, created_at) VALUES (?, datetime('now', '-1 hour'))",
+                         [(i,) for i in range(1, 8)])
+        # A recent row stops the chunk before it
+        conn.execute("INSERT INTO orders (id, created_at) VALUES (8, datetime('now'))")
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_dict_rows(self):
+        cursor = self.connect(dict_row).cursor()
+        self.assertEqual(next_chunk_end(cursor, 'orders', 0, 5, 60), 5)
+        self.assertEqual(next_chunk_end(cursor, 'orders', 5, 5, 60), 7)
+        self.assertIsNone(next_chunk_end(cursor, 'orders', 7, 5, 60))
+
+    def test_sqlite_rows(self):
+        cursor = self.connect(sqlite3.Row).cursor()
+        self.assertEqual(next_chunk_end(cursor, 'orders', 0, 100, 60), 7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Catalog imports with partial columns
+
+Run with: python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database'))
+os.environ.setdefault('DB_TYPE', 'sqlite')
+
+from import_catalog import import_catalog, CatalogImportError
+from migrate import migrate
+
+PRODUCT = {'name': 'Bear Hoodie', 'slug': 'bear-hoodie', 'category': 'sweaters', 'price': '49.99',
+           'description': 'Cozy', 'image_url': 'hoodie.png', 'emoji': '🧥', 'stock_quantity': '12',
+           'is_active': 'true', 'featured': 'true'}
+
+class PartialImportTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.addCleanup(self.conn.close)
+        migrate(self.conn)
+        self.conn.execute("INSERT INTO categories (name, slug) VALUES ('Sweaters', 'sweaters')")
+        self.run_import([PRODUCT])
+
+    def run_import(self, products):
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            counts, _ = import_catalog(cursor, {'products': products})
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+        return counts['products']
+
+    def product(self):
+        return dict(self.conn.execute("SELECT * FROM products WHERE slug = 'bear-hoodie'").fetchone())
+
+    def test_missing_columns_are_kept(self):
+        counts = self.run_import([{'name': 'Bear Hoodie v2', 'slug': 'bear-hoodie',
+                                   'category': 'sweaters', 'price': '54.99'}])
+        self.assertEqual((counts['inserted'], counts['updated']), (0, 1))
+        product = self.product()
+        self.assertEqual((product['name'], product['price']), ('Bear Hoodie v2', 54.99))
+        self.assertEqual((product['description'], product['image_url'], product['emoji']),
+                         ('Cozy', 'hoodie.png', '🧥'))
+        self.assertEqual((product['featured'], product['is_active'], product['stock_quantity']), (1, 1, 12))
+
+    def test_price_only_feed(self):
+        counts = self.run_import([{'slug': 'bear-hoodie', 'price': '39.99'}])
+        self.assertEqual(counts['updated'], 1)
+        self.assertEqual((self.product()['name'], self.product()['price']), ('Bear Hoodie', 39.99))
+        self.assertEqual(self.run_import([{'slug': 'bear-hoodie', 'price': '39.99'}])['unchanged'], 1)
+
+    def test_empty_value_clears_optional_column(self):
+        self.run_import([{'slug': 'bear-hoodie', 'description': '', 'featured': ''}])
+        product = self.product()
+        self.assertIsNone(product['description'])
+        self.assertEqual(product['featured'], 1)
+
+    def test_new_rows_need_required_columns(self):
+        with self.assertRaises(CatalogImportError) as raised:
+            self.run_import([{'slug': 'new-hat', 'price': '19.99'}])
+        self.assertIn('missing name, category_id', raised.exception.errors[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+"""
+Prometheus text rendering of metric samples
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database'))
+
+from metrics import Counter, Gauge
+
+class SampleRenderingTest(unittest.TestCase):
+
+    def test_large_counter_is_exact(self):
+        counter = Counter('test_rows_total', 'Rows', labels=('query',))
+        counter.inc(1234567, query='products')
+        counter.inc(1, query='products')
+        self.assertEqual(counter.samples(), ['test_rows_total{query="products"} 1234568'])
+
+    def test_fractional_values_keep_full_precision(self):
+        counter = Counter('test_seconds_total', 'Seconds')
+        counter.inc(1234567.125)
+        self.assertEqual(counter.samples(), ['test_seconds_total 1234567.125'])
+
+    def test_gauge_values(self):
+        gauge = Gauge('test_pool', 'Pool', ('state',),
+                      lambda: {('idle',): 3, ('ratio',): 0.25, ('limit',): float('inf')})
+        self.assertEqual(gauge.samples(), ['test_pool{state="idle"} 3',
+                                           'test_pool{state="limit"} +Inf',
+                                           'test_pool{state="ratio"} 0.25'])
+
+if __name__ == '__main__':
+    unittest.main()